@@ -0,0 +1,328 @@
+"""
+alerts.py
+Threshold and event alerts evaluated incrementally on every sampler tick.
+
+Each threshold rule keeps its own rolling window over one metric: a running
+sum for the mean, a monotonic deque for the max and an EWMA, so a tick costs
+O(1) amortized per rule no matter how long the window is, and history is
+never re-read. Rules fire after their condition has held for `for` seconds
+and only resolve once the value is back past `clear` (hysteresis), so a
+metric hovering around the threshold does not flap.
+
+Rules come from a JSON file (ALERTS_FILE or --alerts):
+
+    {"webhook": "http://127.0.0.1:9000/hook", "command": ["notify-send", "pulse"],
+     "rules": [
+        {"name": "cpu-high", "metric": "cpu", "agg": "mean", "window": 60, "above": 90, "clear": 80},
+        {"name": "disk-full", "metric": "disk", "above": 95, "clear": 93},
+        {"name": "new-port", "type": "new_port"},
+        {"name": "nginx-errors", "type": "journal", "unit": "nginx.service", "priority": "err"}]}
+
+Every transition (firing, resolved) is POSTed as JSON to the webhook and/or
+written to the command's stdin; both are fire-and-forget.
+"""
+
+import os
+import json
+import math
+import asyncio
+import urllib.request
+from pathlib import Path
+from collections import deque
+
+from journal import PRIORITIES
+
+ALERTS_FILE = Path.home() / ".pingsdashboard" / "alerts.json"
+ALERT_HISTORY = 200    # resolved/fired transitions kept for /api/alerts
+JOURNAL_HOLD = 300.0   # seconds a journal alert stays firing after its last matching line
+NOTIFY_TIMEOUT = 5.0   # seconds for the webhook POST or the command
+AGGREGATES = ("value", "mean", "max", "ewma")
+
+DEFAULT_RULES = [
+    {"name": "cpu-high", "metric": "cpu", "agg": "mean", "window": 60, "above": 90, "clear": 80},
+    {"name": "mem-high", "metric": "mem", "agg": "mean", "window": 60, "above": 95, "clear": 90},
+    {"name": "disk-full", "metric": "disk", "above": 95, "clear": 93},
+    {"name": "new-port", "type": "new_port"},
+]
+
+
+class Window:
+    """Rolling mean and max over the last `seconds`, plus an EWMA with that time constant."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()  # (ts, value)
+        self.total = 0.0
+        self.peaks = deque()    # (ts, value), values strictly decreasing
+        self.ewma = None
+        self.last = None
+        self.first = None
+
+    def add(self, ts, value):
+        if self.first is None:
+            self.first = ts
+        self.samples.append((ts, value))
+        self.total += value
+        while self.peaks and self.peaks[-1][1] <= value:
+            self.peaks.pop()
+        self.peaks.append((ts, value))
+        cutoff = ts - self.seconds
+        # The newest sample always stays, so a zero-length window holds the current value.
+        while self.samples[0][0] <= cutoff and len(self.samples) > 1:
+            self.total -= self.samples.popleft()[1]
+        while self.peaks[0][0] <= cutoff and len(self.peaks) > 1:
+            self.peaks.popleft()
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            # Time-aware smoothing: irregular ticks (idle heartbeat) weigh by elapsed time.
+            alpha = 1 - math.exp(-max(0.0, ts - self.last) / self.seconds) if self.seconds else 1.0
+            self.ewma += alpha * (value - self.ewma)
+        self.last = ts
+        if len(self.samples) == 1:
+            self.total = value  # drop accumulated float error whenever the window drains
+
+    def warm(self, ts):
+        """True once the window has seen a full span of samples."""
+        return self.first is not None and ts - self.first >= self.seconds
+
+    def get(self, agg):
+        if agg == "mean":
+            return self.total / len(self.samples) if self.samples else None
+        if agg == "max":
+            return self.peaks[0][1] if self.peaks else None
+        if agg == "ewma":
+            return self.ewma
+        return self.samples[-1][1] if self.samples else None
+
+
+class ThresholdRule:
+    """A metric aggregate above (or below) a threshold, with a hold time and a clear level."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.metric = spec["metric"]
+        self.agg = spec.get("agg", "value")
+        if self.agg not in AGGREGATES:
+            raise ValueError(f"{self.name}: unknown agg {self.agg!r}")
+        if ("above" in spec) == ("below" in spec):
+            raise ValueError(f"{self.name}: needs exactly one of above/below")
+        self.above = "above" in spec
+        self.threshold = float(spec["above"] if self.above else spec["below"])
+        self.clear = float(spec.get("clear", self.threshold))
+        self.hold = float(spec.get("for", 0))
+        self.window = Window(float(spec.get("window", 0)))
+        self.pending = None  # time the condition started to hold
+        self.firing = False
+
+    def describe(self):
+        op = ">" if self.above else "<"
+        agg = f"{self.agg}({self.metric}, {self.window.seconds:g}s)" if self.agg != "value" else self.metric
+        return f"{agg} {op} {self.threshold:g}" + (f" for {self.hold:g}s" if self.hold else "")
+
+    def evaluate(self, ts, ctx):
+        """Yields (key, firing, value, message) for each alert whose state may have changed."""
+        value = ctx.metrics.get(self.metric)
+        if value is None:
+            return
+        self.window.add(ts, value)
+        value = self.window.get(self.agg)
+        # An aggregate over a half-filled window (e.g. right after start) is not trusted to fire.
+        breached = (value > self.threshold if self.above else value < self.threshold) and (
+            self.agg == "value" or self.window.warm(ts))
+        cleared = value <= self.clear if self.above else value >= self.clear
+        if self.firing:
+            if cleared:
+                self.firing, self.pending = False, None
+        elif breached:
+            self.pending = self.pending if self.pending is not None else ts
+            self.firing = ts - self.pending >= self.hold
+        else:
+            self.pending = None
+        yield "", self.firing, round(value, 2), f"{self.describe()} (now {value:.1f})"
+
+
+class NewPortRule:
+    """A listening socket that was not there when the dashboard started; clears when it closes.
+
+    The dashboard's own sockets are ignored: the baseline is taken while the
+    sampler starts, before the server has bound its port.
+    """
+
+    def __init__(self, spec, pid=None):
+        self.name = spec["name"]
+        self.pid = os.getpid() if pid is None else pid
+        self.baseline = None
+        self.open = {}
+
+    def describe(self):
+        return "new listening port"
+
+    def evaluate(self, ts, ctx):
+        if ctx.listeners is None:
+            return
+        current = {f"{l['proto']}/{l['port']}": l for l in ctx.listeners if l["pid"] != self.pid}
+        if self.baseline is None:
+            self.baseline = set(current)
+            return
+        for key in current.keys() - self.baseline - self.open.keys():
+            l = self.open[key] = current[key]
+            yield key, True, l["port"], f"{l['proto']} port {l['port']} opened by {l['name']} (pid {l['pid']})"
+        for key in self.open.keys() - current.keys():
+            l = self.open.pop(key)
+            yield key, False, l["port"], f"{l['proto']} port {l['port']} closed"
+
+
+class JournalRule:
+    """Journal lines at or above a priority (optionally one unit or a substring); holds for `hold` seconds."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.unit = spec.get("unit") or None
+        priority = spec.get("priority", "err")
+        self.priority = PRIORITIES.index(priority) if priority in PRIORITIES else int(priority)
+        self.match = spec.get("match") or None
+        self.hold = float(spec.get("hold", JOURNAL_HOLD))
+        self.cursor = None
+        self.since = None  # entries logged before the first evaluation (the journal backlog) never fire
+        self.last = None  # (ts, entry) of the latest matching line
+        self.firing = False
+
+    def describe(self):
+        return f"{PRIORITIES[self.priority]}+ journal line" + (f" from {self.unit}" if self.unit else "")
+
+    def evaluate(self, ts, ctx):
+        if ctx.journal is None:
+            return
+        if self.cursor is None:
+            self.cursor, self.since = ctx.journal.cursor, ts
+            return
+        # Reads only the entries added since the previous tick.
+        result = ctx.journal.read(self.cursor, self.unit, self.priority, limit=ctx.journal.entries.maxlen)
+        self.cursor = result["cursor"]
+        for entry in result["entries"]:
+            if entry["ts"] >= self.since and (self.match is None or self.match in entry["message"]):
+                self.last = (ts, entry)
+        if self.last and ts - self.last[0] < self.hold:
+            entry = self.last[1]
+            if not self.firing or self.last[0] == ts:
+                self.firing = True
+                yield "", True, entry["priority"], f"{entry['unit']}: {entry['message'][:200]}"
+        elif self.firing:
+            self.firing = False
+            yield "", False, None, f"no {self.describe()} for {self.hold:g}s"
+
+
+RULE_TYPES = {"threshold": ThresholdRule, "new_port": NewPortRule, "journal": JournalRule}
+
+
+def load_config(path=None):
+    """Reads the alert config; the defaults apply when no file was given and ALERTS_FILE is missing."""
+    if path is None and not ALERTS_FILE.exists():
+        return {"rules": DEFAULT_RULES}
+    with open(path or ALERTS_FILE) as f:
+        return json.load(f)
+
+
+class Context:
+    """What one tick hands to the rules; None for sources that were not refreshed."""
+
+    def __init__(self, metrics, listeners=None, journal=None):
+        self.metrics = metrics
+        self.listeners = listeners
+        self.journal = journal
+
+
+class AlertEngine:
+    def __init__(self, config=None):
+        config = config if config is not None else {"rules": DEFAULT_RULES}
+        self.rules = []
+        for spec in config.get("rules", []):
+            kind = spec.get("type", "threshold")
+            if kind not in RULE_TYPES:
+                raise ValueError(f"{spec.get('name')}: unknown rule type {kind!r}")
+            self.rules.append(RULE_TYPES[kind](spec))
+        self.webhook = config.get("webhook")
+        self.command = config.get("command")
+        self.active = {}  # (rule, key) -> alert dict
+        self.history = deque(maxlen=ALERT_HISTORY)
+        self.version = 0  # bumped on every transition
+        self.notifications = set()
+
+    def needs(self, kind):
+        return any(isinstance(r, RULE_TYPES[kind]) for r in self.rules)
+
+    def evaluate(self, ts, ctx):
+        for rule in self.rules:
+            try:
+                changes = list(rule.evaluate(ts, ctx))
+            except Exception as e:
+                print(f"[alerts] rule {rule.name} failed: {e}")
+                continue
+            for key, firing, value, message in changes:
+                ident = (rule.name, key)
+                alert = self.active.get(ident)
+                if firing and alert is None:
+                    alert = self.active[ident] = {
+                        "rule": rule.name, "key": key, "state": "firing", "since": ts,
+                        "value": value, "message": message, "condition": rule.describe(),
+                    }
+                    self.transition(alert)
+                elif firing:
+                    alert["value"], alert["message"] = value, message
+                elif alert is not None:
+                    del self.active[ident]
+                    self.transition({**alert, "state": "resolved", "until": ts, "value": value,
+                                     "resolution": message})
+
+    def transition(self, alert):
+        self.version += 1
+        self.history.append(dict(alert))
+        print(f"[alerts] {alert['state']}: {alert['rule']} {alert.get('resolution', alert['message'])}")
+        if self.webhook or self.command:
+            task = asyncio.create_task(self.notify(alert))
+            self.notifications.add(task)  # keep a reference until it finishes
+            task.add_done_callback(self.notifications.discard)
+
+    def firing(self):
+        """Firing alerts, oldest first, as they go into the snapshot.
+
+        Copies: evaluate() updates the live dicts in place, and a snapshot sharing
+        them would never differ from the previous one.
+        """
+        return sorted((dict(a) for a in self.active.values()), key=lambda a: a["since"])
+
+    def report(self):
+        return {
+            "firing": self.firing(),
+            "recent": list(reversed(self.history)),
+            "rules": [{"name": r.name, "condition": r.describe()} for r in self.rules],
+        }
+
+    async def notify(self, alert):
+        payload = json.dumps(alert).encode()
+        if self.webhook:
+            try:
+                await asyncio.wait_for(asyncio.to_thread(self.post, payload), NOTIFY_TIMEOUT)
+            except Exception as e:
+                print(f"[alerts] webhook failed: {e}")
+        if self.command:
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *self.command, stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+                await asyncio.wait_for(proc.communicate(payload + b"\n"), NOTIFY_TIMEOUT)
+            except Exception as e:
+                print(f"[alerts] command failed: {e}")
+                if proc and proc.returncode is None:
+                    proc.kill()
+
+    def post(self, payload):
+        req = urllib.request.Request(self.webhook, data=payload, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=NOTIFY_TIMEOUT) as res:
+            res.read()
+
+    def close(self):
+        for task in self.notifications:
+            task.cancel()
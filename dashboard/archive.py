@@ -0,0 +1,176 @@
+"""
+archive.py
+Persistent on-disk archive of sampled metrics.
+
+Records are fixed-width binary structs appended to preallocated, memory-mapped
+segment files. Appending is a struct.pack_into plus a header counter update
+(no fsync; the kernel writes the pages back), opening only maps the newest
+segment, and range reads binary-search the mapping and unpack straight from it.
+Oldest segments are deleted once the archive grows past ARCHIVE_MAX_BYTES.
+"""
+
+import os
+import mmap
+import struct
+from pathlib import Path
+
+ARCHIVE_DIR = Path.home() / ".pingsdashboard" / "archive"
+ARCHIVE_FIELDS = ("cpu", "mem", "disk", "load1", "load5", "load15", "net.up", "net.down")
+SEGMENT_BYTES = 4 * 1024 * 1024       # ~100k records, a bit over two days at a 2 s tick
+ARCHIVE_MAX_BYTES = 64 * 1024 * 1024  # oldest segments are removed beyond this
+MAX_POINTS = 2000
+
+MAGIC = b"PLDA"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHxxQ")  # magic, version, record size, field count, record count
+HEADER_SIZE = 64
+COUNT_OFFSET = 12
+
+
+class Segment:
+    def __init__(self, path, record, writable=False):
+        self.path = path
+        self.record = record
+        self.writable = writable
+        self.file = open(path, "r+b" if writable else "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, size, _, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or size != record.size:
+            self.close()
+            raise ValueError(f"{path.name}: not an archive segment for this schema")
+        self.capacity = (len(self.map) - HEADER_SIZE) // record.size
+
+    @classmethod
+    def create(cls, path, record, nfields, size=SEGMENT_BYTES):
+        with open(path, "wb") as f:
+            f.truncate(size)
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+            f.write(HEADER.pack(MAGIC, VERSION, record.size, nfields, 0))
+        return cls(path, record, writable=True)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, values):
+        self.record.pack_into(self.map, HEADER_SIZE + self.count * self.record.size, *values)
+        # Counter goes last so a crash never exposes a half-written record.
+        self.count += 1
+        struct.pack_into("<Q", self.map, COUNT_OFFSET, self.count)
+
+    def ts(self, index):
+        return struct.unpack_from("<d", self.map, HEADER_SIZE + index * self.record.size)[0]
+
+    def bisect(self, ts):
+        """Index of the first record taken at or after ts."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def view(self, start, end):
+        """Zero-copy memoryview over the records between unix times start and end."""
+        first, last = self.bisect(start), self.bisect(end + 1e-9)
+        size = self.record.size
+        return memoryview(self.map)[HEADER_SIZE + first * size:HEADER_SIZE + last * size]
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # a reader still holds a view; the mapping goes away with it
+        self.file.close()
+
+
+class Archive:
+    """Append-only, size-capped store of ARCHIVE_FIELDS samples."""
+
+    def __init__(self, directory=ARCHIVE_DIR, fields=ARCHIVE_FIELDS,
+                 segment_bytes=SEGMENT_BYTES, max_bytes=ARCHIVE_MAX_BYTES):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.fields = tuple(fields)
+        self.record = struct.Struct("<d" + "f" * len(self.fields))
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.readers = {}  # path -> read-only Segment, mapped lazily
+        self.active = None
+        paths = self.segment_paths()
+        if paths:
+            try:
+                self.active = Segment(paths[-1], self.record, writable=True)
+            except (OSError, ValueError):
+                self.active = None  # schema changed or file damaged; start a new segment
+
+    def segment_paths(self):
+        return sorted(self.dir.glob("seg-*.dat"))
+
+    def append(self, ts, metrics):
+        if self.active is None or self.active.full:
+            self.rotate(ts)
+        self.active.append((ts, *(float(metrics.get(f) or 0.0) for f in self.fields)))
+
+    def rotate(self, ts):
+        if self.active is not None:
+            self.active.close()
+        path = self.dir / f"seg-{int(ts * 1000):016d}.dat"
+        self.active = Segment.create(path, self.record, len(self.fields), self.segment_bytes)
+        self.trim()
+
+    def trim(self):
+        paths = self.segment_paths()
+        while len(paths) > 1 and len(paths) * self.segment_bytes > self.max_bytes:
+            oldest = paths.pop(0)
+            reader = self.readers.pop(oldest, None)
+            if reader:
+                reader.close()
+            oldest.unlink(missing_ok=True)
+
+    def segment(self, path):
+        if self.active is not None and path == self.active.path:
+            return self.active
+        if path not in self.readers:
+            try:
+                self.readers[path] = Segment(path, self.record)
+            except (OSError, ValueError):
+                return None
+        return self.readers[path]
+
+    def query(self, start, end):
+        """Returns (fields, [[ts, *values], ...]) for records between start and end, decimated to MAX_POINTS."""
+        paths = self.segment_paths()
+        views = []
+        for i, path in enumerate(paths):
+            # Segment names carry their first timestamp, so non-overlapping ones are skipped unmapped.
+            first = int(path.stem[4:]) / 1000
+            following = int(paths[i + 1].stem[4:]) / 1000 if i + 1 < len(paths) else float("inf")
+            if first > end or following < start:
+                continue
+            segment = self.segment(path)
+            if segment is not None and segment.count:
+                views.append(segment.view(start, end))
+
+        total = sum(len(v) for v in views) // self.record.size
+        every = max(1, -(-total // MAX_POINTS))
+        rows = []
+        n = 0
+        for view in views:
+            with view:
+                for row in self.record.iter_unpack(view):
+                    if n % every == 0:
+                        rows.append([row[0], *(round(v, 3) for v in row[1:])])
+                    n += 1
+        return self.fields, rows
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+        if self.active is not None:
+            self.active.close()
+            self.active = None
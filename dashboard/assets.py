@@ -0,0 +1,70 @@
+"""
+assets.py
+Self-contained static bundle: the page template plus its CSS, JS, icons and logo.
+
+Everything under static/ is loaded, lightly minified and compressed once at
+start-up, and served under /static/<version>/ where the version is a hash of
+the whole bundle, so responses can be cached as immutable and a new release
+simply changes every URL. Nothing is fetched from a CDN.
+"""
+
+import os
+import re
+import hashlib
+
+from jinja2 import Environment, FileSystemLoader
+
+from encoding import StaticBody
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(HERE, "static")
+TEMPLATE_DIR = os.path.join(HERE, "templates")
+MEDIA_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def minify(name, data):
+    """Whitespace-only minification: safe without a real parser, and most of the win before compression."""
+    if name.endswith(".css"):
+        text = re.sub(r"/\*.*?\*/", "", data.decode(), flags=re.S)
+        text = re.sub(r"\s*([{};,:>])\s*", r"\1", text)
+        return re.sub(r"\s+", " ", text).strip().encode()
+    if name.endswith(".js"):
+        lines = (line.strip() for line in data.decode().splitlines())
+        return "\n".join(l for l in lines if l and not l.startswith("//")).encode()
+    if name.endswith(".svg"):
+        text = re.sub(r"<!--.*?-->", "", data.decode(), flags=re.S)
+        return re.sub(r">\s+<", "><", text).strip().encode()
+    return data
+
+
+class Bundle:
+    def __init__(self, static_dir=STATIC_DIR, template_dir=TEMPLATE_DIR):
+        self.files = {}
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(static_dir)):
+            ext = os.path.splitext(name)[1]
+            if ext not in MEDIA_TYPES:
+                continue
+            with open(os.path.join(static_dir, name), "rb") as f:
+                data = minify(name, f.read())
+            # PNGs are already compressed; only text gets gzip/brotli variants.
+            self.files[name] = (StaticBody(data, compressible=ext != ".png"), MEDIA_TYPES[ext])
+            digest.update(name.encode() + b"\0" + data)
+        self.version = digest.hexdigest()[:12]
+        env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
+        self.index = StaticBody(env.get_template("index.html").render(asset=self.url).encode())
+
+    def url(self, name):
+        if name not in self.files:
+            raise KeyError(f"no static asset named {name}")
+        return f"/static/{self.version}/{name}"
+
+    def get(self, version, name):
+        """(body, media type) for a current asset URL, else None."""
+        return self.files.get(name) if version == self.version else None
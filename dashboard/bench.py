@@ -0,0 +1,314 @@
+"""
+bench.py
+Benchmarks for the sampler's collectors and the API, plus /proc fixtures.
+
+    python bench.py capture FIXTURE          copy the /proc files the collectors read
+    python bench.py synth FIXTURE --procs 10000 --sockets 50000
+    python bench.py run [--proc FIXTURE]     time every collector, a tick and /api/stats in-process
+    python bench.py http [--proc FIXTURE] --clients 50 --requests 5000
+
+A fixture is a directory laid out like /proc (pid stat/io files, fd symlinks,
+net tables, stat, diskstats), so ProcTable, PortIndex and DeviceStats read it
+exactly like the real thing. Timings reuse perf.Histogram.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import subprocess
+
+from fastapi import Request
+
+from devstats import DeviceStats
+from hub import AgentClient
+from perf import Histogram, timed
+from ports import PortIndex, TABLES
+from proctable import ProcTable
+
+PROC = "/proc"
+HOST_FILES = ("stat", "diskstats", "net/dev", *(f"net/{t}" for t in TABLES), "self/mountinfo")
+PID_FILES = ("stat", "io")
+
+
+# ---- fixtures -------------------------------------------------------------
+
+def capture(dest, proc=PROC):
+    """Copies the /proc files the collectors read into dest; fd links are kept as symlinks."""
+    os.makedirs(f"{dest}/net", exist_ok=True)
+    os.makedirs(f"{dest}/self", exist_ok=True)
+    for name in HOST_FILES:
+        try:
+            with open(f"{proc}/{name}", "rb") as src, open(f"{dest}/{name}", "wb") as out:
+                out.write(src.read())
+        except OSError:
+            pass
+    pids = links = 0
+    for entry in os.listdir(proc):
+        if not entry.isdigit():
+            continue
+        try:
+            os.makedirs(f"{dest}/{entry}/fd", exist_ok=True)
+            for name in PID_FILES:
+                try:
+                    with open(f"{proc}/{entry}/{name}", "rb") as src, open(f"{dest}/{entry}/{name}", "wb") as out:
+                        out.write(src.read())
+                except PermissionError:
+                    continue
+            for fd in os.listdir(f"{proc}/{entry}/fd"):
+                os.symlink(os.readlink(f"{proc}/{entry}/fd/{fd}"), f"{dest}/{entry}/fd/{fd}")
+                links += 1
+        except OSError:
+            pass  # exited mid-copy, or fds of another user without root
+        pids += 1
+    return pids, links
+
+
+def stat_line(pid, name, ticks, start, threads, rss_pages):
+    # Fields after ")": state ppid pgrp session tty tpgid flags minflt cminflt majflt cmajflt
+    # utime stime cutime cstime priority nice num_threads itrealvalue starttime vsize rss
+    return (f"{pid} ({name}) S 1 {pid} {pid} 0 -1 4194560 0 0 0 0 {ticks // 2} {ticks - ticks // 2} "
+            f"0 0 20 0 {threads} 0 {start} {rss_pages * 4096 * 4} {rss_pages}\n")
+
+
+def synth(dest, procs=10000, sockets=50000, listening=200, seed=1):
+    """Writes a synthetic fixture with the given process and socket counts."""
+    rng = random.Random(seed)
+    os.makedirs(f"{dest}/net", exist_ok=True)
+    os.makedirs(f"{dest}/self", exist_ok=True)
+    shutil.copyfile(f"{PROC}/stat", f"{dest}/stat")
+    shutil.copyfile(f"{PROC}/net/dev", f"{dest}/net/dev")
+    shutil.copyfile(f"{PROC}/diskstats", f"{dest}/diskstats")
+    shutil.copyfile(f"{PROC}/self/mountinfo", f"{dest}/self/mountinfo")
+
+    pids = rng.sample(range(100, 4 * procs + 100), procs)
+    owners = {}
+    for i, inode in enumerate(range(100000, 100000 + sockets)):
+        owners.setdefault(pids[i % procs], []).append(inode)
+    names = ("nginx", "postgres", "python3", "java", "node", "redis-server", "sshd", "bash")
+    for pid in pids:
+        os.makedirs(f"{dest}/{pid}/fd", exist_ok=True)
+        with open(f"{dest}/{pid}/stat", "w") as f:
+            f.write(stat_line(pid, rng.choice(names), rng.randrange(10**6), rng.randrange(10**7),
+                              rng.randrange(1, 64), rng.randrange(1000, 100000)))
+        with open(f"{dest}/{pid}/io", "w") as f:
+            f.write(f"rchar: 0\nwchar: 0\nread_bytes: {rng.randrange(10**9)}\nwrite_bytes: {rng.randrange(10**9)}\n")
+        for fd, inode in enumerate(owners.get(pid, ()), start=3):
+            os.symlink(f"socket:[{inode}]", f"{dest}/{pid}/fd/{fd}")
+
+    header = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+    per_table = (sockets + len(TABLES) - 1) // len(TABLES)
+    inodes = iter(range(100000, 100000 + sockets))
+    for n, proto in enumerate(TABLES):
+        v6 = proto.endswith("6")
+        with open(f"{dest}/net/{proto}", "w") as f:
+            f.write(header)
+            for sl in range(per_table):
+                inode = next(inodes, None)
+                if inode is None:
+                    break
+                listen = sl < listening // len(TABLES)
+                state = ("0A" if proto.startswith("tcp") else "07") if listen else "01"
+                addr = "0" * 32 if v6 else "0100007F"
+                f.write(f"{sl:4}: {addr}:{1024 + n * per_table + sl:04X} {addr}:0000 {state} "
+                        f"00000000:00000000 00:00000000 00000000     0        0 {inode} 1 0 100 0 0 10 0\n")
+    return procs, sockets
+
+
+# ---- in-process benchmarks ------------------------------------------------
+
+def report(results, as_json=False):
+    rows = {name: h.summary() for name, h in results.items()}
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    w = max(map(len, rows)) + 2
+    print(f"{'stage':<{w}}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in rows.items():
+        print(f"{name:<{w}}{s['calls']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+
+
+def use_fixture(sampler, root):
+    """Points the sampler's /proc readers at a fixture directory."""
+    sampler.procs = ProcTable(root)
+    sampler.ports = PortIndex(root)
+    sampler.devices = DeviceStats(root)
+
+
+def fill_journal(journal, n):
+    units = ("nginx.service", "sshd.service", "cron.service", "kernel")
+    for i in range(n):
+        journal.add(json.dumps({"__REALTIME_TIMESTAMP": str(int(time.time() * 1e6)), "_HOSTNAME": "bench",
+                                "_SYSTEMD_UNIT": units[i % len(units)], "SYSLOG_IDENTIFIER": "bench",
+                                "_PID": str(1000 + i % 50), "PRIORITY": str(i % 8), "MESSAGE": f"message {i}"}))
+
+
+async def run_inprocess(root, repeat):
+    import linux_utility
+
+    sampler = linux_utility.SAMPLER
+    if root:
+        use_fixture(sampler, root)
+    fill_journal(sampler.journal, 5000)
+    results = {}
+
+    # Each collector on its own; the first (cold) run is reported separately.
+    for c in sampler.collectors.values():
+        cold = results[f"{c.name} (cold)"] = Histogram()
+        with timed(cold):
+            c.run(time.monotonic())
+        c.perf = results[c.name] = Histogram()
+        for _ in range(repeat):
+            c.run(time.monotonic())
+        c.perf = Histogram()
+
+    ports_cold = results["ports full scan"] = Histogram()
+    for _ in range(max(1, repeat // 10)):
+        with timed(ports_cold):
+            PortIndex(root or PROC).update()
+    journal_read = results["journal read"] = Histogram()
+    for _ in range(repeat):
+        with timed(journal_read):
+            sampler.journal.read(0, "nginx.service", 3, 200)
+
+    # Whole pipeline: a tick with every collector due, then the handlers.
+    sampler.pool = linux_utility.ThreadPoolExecutor(max_workers=len(sampler.collectors))
+    sampler.subscribe()
+    tick = results["tick"] = Histogram()
+    request = Request({"type": "http", "method": "GET", "path": "/api/stats", "query_string": b"",
+                       "headers": [(b"accept-encoding", b"gzip")]})
+    stats = results["/api/stats"] = Histogram()
+    fields = results["/api/stats?fields&format=compact"] = Histogram()
+    for _ in range(repeat):
+        for c in sampler.collectors.values():
+            c.updated = None
+        with timed(tick):
+            await sampler.tick()
+        with timed(stats):
+            await linux_utility.stats(request, fields="", fmt="json")
+        with timed(fields):
+            await linux_utility.stats(request, fields="usage,net_speed,procs", fmt="compact")
+    sampler.pool.shutdown()
+    return results
+
+
+# ---- HTTP load ------------------------------------------------------------
+
+def wait_for_port(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+async def load(host, port, path, clients, requests):
+    latency, errors, left = Histogram(), 0, [requests]
+
+    async def client():
+        nonlocal errors
+        conn = AgentClient(host, port)
+        while left[0] > 0:
+            left[0] -= 1
+            started = time.perf_counter()
+            try:
+                status, _ = await conn.get(path)
+                if status != 200:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latency.record(time.perf_counter() - started)
+        conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latency.errors = errors
+    return latency, requests / elapsed
+
+
+def serve(root, port):
+    import uvicorn
+    import linux_utility
+
+    if root:
+        use_fixture(linux_utility.SAMPLER, root)
+    uvicorn.run(linux_utility.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def run_http(args):
+    server = None
+    host, port = "127.0.0.1", args.port
+    if args.url:
+        host, _, port = args.url.rpartition(":")
+        port = int(port)
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)]
+        server = subprocess.Popen(cmd + (["--proc", args.proc] if args.proc else []))
+        if not wait_for_port(port):
+            server.kill()
+            sys.exit("server did not start")
+    try:
+        results = {}
+        for path in args.path:
+            latency, rate = asyncio.run(load(host, port, path, args.clients, args.requests))
+            results[f"{path} ({rate:.0f} req/s)"] = latency
+        report(results, args.json)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard benchmarks and /proc fixtures")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("capture", help="copy this host's /proc into a fixture directory")
+    p.add_argument("dest")
+    p = sub.add_parser("synth", help="write a synthetic fixture")
+    p.add_argument("dest")
+    p.add_argument("--procs", type=int, default=10000)
+    p.add_argument("--sockets", type=int, default=50000)
+    p.add_argument("--listening", type=int, default=200)
+    p = sub.add_parser("run", help="time collectors, ticks and handlers in-process")
+    p.add_argument("--proc", help="fixture directory instead of /proc")
+    p.add_argument("--repeat", type=int, default=50)
+    p.add_argument("--json", action="store_true")
+    p = sub.add_parser("http", help="load /api/stats through uvicorn with concurrent keep-alive clients")
+    p.add_argument("--proc", help="fixture directory for the server started by the benchmark")
+    p.add_argument("--url", metavar="HOST:PORT", help="benchmark an already running dashboard instead")
+    p.add_argument("--port", type=int, default=8799)
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--requests", type=int, default=5000)
+    p.add_argument("--path", action="append", help="repeatable; default /api/stats")
+    p.add_argument("--json", action="store_true")
+    p = sub.add_parser("serve", help=argparse.SUPPRESS)
+    p.add_argument("--proc")
+    p.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        pids, links = capture(args.dest)
+        print(f"captured {pids} processes and {links} fd links into {args.dest}")
+    elif args.command == "synth":
+        procs, sockets = synth(args.dest, args.procs, args.sockets, args.listening)
+        print(f"wrote {procs} processes and {sockets} sockets into {args.dest}")
+    elif args.command == "run":
+        report(asyncio.run(run_inprocess(args.proc, args.repeat)), args.json)
+    elif args.command == "http":
+        args.path = args.path or ["/api/stats"]
+        run_http(args)
+    elif args.command == "serve":
+        serve(args.proc, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+devstats.py
+Per-core, per-NIC and per-block-device counters from one batched /proc pass.
+
+Each update() reads /proc/stat, /proc/net/dev and /proc/diskstats once and
+turns the counters into rates against the previous update.
+"""
+
+import os
+import time
+
+PROC = "/proc"
+SYS_BLOCK = "/sys/block"
+SECTOR = 512
+SKIP_DEVICES = ("loop", "ram")
+
+
+def read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+class DeviceStats:
+    def __init__(self, proc=PROC):
+        self.proc = proc
+        self.prev = None
+        self.prev_time = None
+        self.whole_disks = {}  # device name -> is it a whole disk (not a partition)
+        self.update()
+
+    def is_whole_disk(self, name):
+        if name not in self.whole_disks:
+            # /sys/block only lists whole devices; looked up once per device name.
+            self.whole_disks[name] = (not name.startswith(SKIP_DEVICES)
+                                      and os.path.exists(f"{SYS_BLOCK}/{name.replace('/', '!')}"))
+        return self.whole_disks[name]
+
+    def read_counters(self):
+        cpus = {}
+        for line in read(f"{self.proc}/stat").splitlines():
+            if not line.startswith(b"cpu"):
+                break
+            name, *values = line.split()
+            values = [int(v) for v in values[:8]]  # user..steal; guest time is already in user
+            cpus[name.decode()] = (sum(values) - values[3] - values[4], sum(values))
+
+        nics = {}
+        for line in read(f"{self.proc}/net/dev").splitlines()[2:]:
+            name, _, data = line.partition(b":")
+            v = data.split()
+            # rx bytes, tx bytes, rx+tx errors, rx+tx drops
+            nics[name.strip().decode()] = (int(v[0]), int(v[8]), int(v[2]) + int(v[10]), int(v[3]) + int(v[11]))
+
+        disks = {}
+        for line in read(f"{self.proc}/diskstats").splitlines():
+            v = line.split()
+            name = v[2].decode()
+            if self.is_whole_disk(name):
+                # reads, sectors read, writes, sectors written, ms spent doing I/O
+                disks[name] = (int(v[3]), int(v[5]), int(v[7]), int(v[9]), int(v[12]))
+        return cpus, nics, disks
+
+    def update(self):
+        """Returns {"cpu", "cores", "nics", "disks"} rates since the previous update."""
+        now = time.monotonic()
+        cpus, nics, disks = current = self.read_counters()
+        prev, elapsed = self.prev, (now - self.prev_time) if self.prev_time else 0.0
+        self.prev, self.prev_time = current, now
+        if not prev or not elapsed:
+            return {"cpu": 0.0, "cores": [], "nics": [], "disks": []}
+        prev_cpus, prev_nics, prev_disks = prev
+
+        def busy(name):
+            b, t = cpus[name]
+            pb, pt = prev_cpus.get(name, (b, t))
+            return round(100 * (b - pb) / (t - pt), 1) if t > pt else 0.0
+
+        cores = [busy(name) for name in cpus if name != "cpu"]
+        nic_rates = []
+        for name, (rx, tx, errs, drops) in nics.items():
+            prx, ptx, perrs, pdrops = prev_nics.get(name, (rx, tx, errs, drops))
+            nic_rates.append({
+                "name": name,
+                "rx_rate": max(0, rx - prx) / elapsed,
+                "tx_rate": max(0, tx - ptx) / elapsed,
+                "errs": errs,
+                "drops": drops,
+                "err_rate": max(0, errs - perrs + drops - pdrops) / elapsed,
+                "active": bool(rx or tx),
+            })
+        disk_rates = []
+        for name, (r, rs, w, ws, io_ms) in disks.items():
+            pr, prs, pw, pws, pio = prev_disks.get(name, (r, rs, w, ws, io_ms))
+            disk_rates.append({
+                "name": name,
+                "r_iops": max(0, r - pr) / elapsed,
+                "w_iops": max(0, w - pw) / elapsed,
+                "r_bps": max(0, rs - prs) * SECTOR / elapsed,
+                "w_bps": max(0, ws - pws) * SECTOR / elapsed,
+                "util": min(100.0, max(0, io_ms - pio) / (elapsed * 10)),
+            })
+        return {"cpu": busy("cpu"), "cores": cores, "nics": nic_rates, "disks": disk_rates}
@@ -0,0 +1,100 @@
+"""
+encoding.py
+Response encodings: Accept-Encoding negotiation, precompressed bodies and compact values.
+
+Bodies are compressed once and cached by the caller (per sampler tick, or
+for the lifetime of the process for the page), so a request only ever picks
+prebuilt bytes. Brotli and MessagePack are used when their packages are
+installed and skipped otherwise.
+"""
+
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MIN_COMPRESS = 1024  # bytes; smaller bodies are sent as they are
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5   # good ratio at a cost close to gzip -6; the page itself uses 11
+
+
+class Formatted(str):
+    """A display string ("1.50GB", "2h 5m") that remembers the number it was made from."""
+
+    def __new__(cls, text, raw):
+        obj = super().__new__(cls, text)
+        obj.raw = raw
+        return obj
+
+
+def compact(value):
+    """Replaces every Formatted string with its raw number, recursively."""
+    if isinstance(value, Formatted):
+        return value.raw
+    if isinstance(value, dict):
+        return {k: compact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [compact(v) for v in value]
+    return value
+
+
+def negotiate(accept_encoding):
+    """Best encoding the client accepts: br, then gzip, else None (identity)."""
+    accepted = set()
+    for item in (accept_encoding or "").lower().split(","):
+        name, _, params = item.partition(";")
+        key, _, q = params.partition("=")
+        try:
+            if key.strip() == "q" and float(q) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, best=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(data, 9 if best else GZIP_LEVEL, mtime=0)
+
+
+# A strong ETag names one exact representation, so each encoding gets its own.
+ETAG_SUFFIX = {None: "", "gzip": "-gz", "br": "-br"}
+
+
+class StaticBody:
+    """A response body that never changes: every encoding built up front, each with a strong ETag."""
+
+    def __init__(self, data, compressible=True):
+        self.data = data
+        self.variants = {None: data}
+        if compressible:
+            self.variants["gzip"] = compress(data, "gzip", best=True)
+            if brotli is not None:
+                self.variants["br"] = compress(data, "br", best=True)
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self.etags = {encoding: f'"{digest}{ETAG_SUFFIX[encoding]}"' for encoding in self.variants}
+
+    def variant(self, accept_encoding):
+        """(encoding, body, etag) to send for this Accept-Encoding header."""
+        encoding = negotiate(accept_encoding)
+        if encoding not in self.variants:
+            encoding = None
+        return encoding, self.variants[encoding], self.etags[encoding]
+
+    def matches(self, if_none_match, etag):
+        tags = [t.strip().removeprefix("W/") for t in (if_none_match or "").split(",")]
+        return etag in tags or "*" in tags
@@ -0,0 +1,148 @@
+"""
+filesystems.py
+Usage of every real mount (bytes and inodes), safe against hung network filesystems.
+
+/proc/self/mountinfo is parsed once and re-parsed only after the kernel
+signals a mount table change (POLLPRI on the open file). Each statvfs call
+runs in its own daemon thread with a per-mount timeout: a mount whose call
+does not return in time keeps its last result, is flagged as hung and gets
+no new call until the stuck one comes back. A hung call only ever holds its
+own thread, so any number of dead NFS servers cannot delay healthy mounts
+(a shared pool would fill up with them) or block the process from exiting.
+"""
+
+import os
+import time
+import select
+import threading
+from concurrent.futures import Future, wait
+
+MOUNTINFO = "/proc/self/mountinfo"
+FS_TIMEOUT = 0.5        # seconds a statvfs call may take
+FS_REFRESH = 30.0       # seconds between statvfs calls for one local mount
+FS_REFRESH_NET = 60.0   # same for network filesystems
+
+PSEUDO_FS = {
+    "proc", "sysfs", "devtmpfs", "devpts", "tmpfs", "ramfs", "cgroup", "cgroup2", "securityfs",
+    "pstore", "debugfs", "tracefs", "bpf", "mqueue", "hugetlbfs", "configfs", "fusectl", "autofs",
+    "binfmt_misc", "overlay", "squashfs", "nsfs", "efivarfs", "rpc_pipefs", "selinuxfs", "nfsd",
+    "fuse.gvfsd-fuse", "fuse.portal",
+}
+NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "ceph", "glusterfs", "fuse.sshfs", "fuse.glusterfs", "9p"}
+
+
+def call_in_thread(fn, *args):
+    """Runs fn(*args) in a new daemon thread; returns a Future for its result."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="statvfs", daemon=True).start()
+    return future
+
+
+def unescape(path):
+    # mountinfo escapes space, tab, newline and backslash as \\ooo octal.
+    if "\\" not in path:
+        return path
+    out, i = [], 0
+    while i < len(path):
+        if path[i] == "\\" and path[i + 1:i + 4].isdigit():
+            out.append(chr(int(path[i + 1:i + 4], 8)))
+            i += 4
+        else:
+            out.append(path[i])
+            i += 1
+    return "".join(out)
+
+
+class Mount:
+    def __init__(self, point, device, fstype):
+        self.point = point
+        self.device = device
+        self.fstype = fstype
+        self.network = fstype in NETWORK_FS or fstype.startswith("nfs")
+        self.usage = None     # last os.statvfs_result
+        self.checked = None   # monotonic time of the last completed statvfs
+        self.future = None    # statvfs call in flight
+        self.hung = False
+        self.error = None
+
+
+class FilesystemTable:
+    def __init__(self, mountinfo=MOUNTINFO):
+        self.path = mountinfo
+        self.mounts = {}
+        self.file = open(mountinfo, "rb")
+        self.poller = select.poll()
+        self.poller.register(self.file, select.POLLPRI | select.POLLERR)
+        self.parse()
+
+    def changed(self):
+        return bool(self.poller.poll(0))
+
+    def parse(self):
+        self.file.seek(0)
+        data = self.file.read()
+        mounts = {}
+        devices = {}
+        for line in data.decode(errors="replace").splitlines():
+            left, _, right = line.partition(" - ")
+            fields, tail = left.split(), right.split()
+            if len(fields) < 5 or len(tail) < 2:
+                continue
+            fstype, source, dev = tail[0], tail[1], fields[2]
+            if fstype in PSEUDO_FS:
+                continue
+            point = unescape(fields[4])
+            # Bind mounts repeat a device; keep its shortest mount point.
+            if dev in devices and len(devices[dev]) <= len(point):
+                continue
+            if dev in devices:
+                mounts.pop(devices[dev], None)
+            devices[dev] = point
+            # Keep cached usage (and any hung call) for mounts that are still there.
+            old = self.mounts.get(point)
+            mounts[point] = old if old and old.fstype == fstype else Mount(point, source, fstype)
+        self.mounts = mounts
+
+    def update(self):
+        """Refreshes mounts that are due and returns them; waits at most FS_TIMEOUT."""
+        if self.changed():
+            self.parse()
+        now = time.monotonic()
+        started = []
+        for m in self.mounts.values():
+            if m.future is not None:
+                if not m.future.done():
+                    continue  # still hung: never stack a second call on the same mount
+                self.finish(m, now)
+            refresh = FS_REFRESH_NET if m.network else FS_REFRESH
+            if m.checked is None or now - m.checked >= refresh:
+                m.future = call_in_thread(os.statvfs, m.point)
+                started.append(m)
+        if started:
+            wait([m.future for m in started], timeout=FS_TIMEOUT)
+        for m in started:
+            if m.future.done():
+                self.finish(m, now)
+            else:
+                m.hung = True
+        return list(self.mounts.values())
+
+    def finish(self, m, now):
+        try:
+            m.usage = m.future.result()
+            m.error = None
+        except OSError as e:
+            m.error = e.strerror or str(e)
+        m.future = None
+        m.hung = False
+        m.checked = now
+
+    def close(self):
+        self.file.close()
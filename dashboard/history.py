@@ -0,0 +1,156 @@
+"""
+history.py
+Fixed-size, multi-resolution time-series store for the dashboard sampler.
+
+Every metric is a series of float32 ring buffers, one per resolution tier.
+Each slot of a tier holds the min/avg/max of all samples that fell into its
+bucket, so memory is fixed at start-up and does not grow with uptime.
+"""
+
+import math
+from array import array
+
+# (bucket width in seconds, number of buckets) per tier, finest first:
+# 1 s for 10 min, 10 s for 24 h, 1 min for 7 days.
+TIERS = ((1, 600), (10, 8640), (60, 10080))
+# Series per group, ~230KB each with the tiers above. Per-NIC and per-process
+# series have their own caps, so many interfaces can never crowd out cpu or mem.
+SERIES_LIMITS = {"core": 8, "nic": 12, "proc": 6}
+MAX_POINTS = 2000    # upper bound on points returned by one query
+
+NAN = float("nan")
+
+
+class Tier:
+    def __init__(self, step, slots):
+        self.step = step
+        self.slots = slots
+        # Bucket number held by each slot, so stale slots can be told apart from live ones.
+        self.buckets = array("q", [-1]) * slots
+        self.current = -1
+
+    @property
+    def retention(self):
+        return self.step * self.slots
+
+
+class Series:
+    def __init__(self, tiers):
+        self.mins = [array("f", [NAN]) * t.slots for t in tiers]
+        self.maxs = [array("f", [NAN]) * t.slots for t in tiers]
+        self.avgs = [array("f", [NAN]) * t.slots for t in tiers]
+        self.counts = [0] * len(tiers)  # samples in each tier's current bucket
+        self.last_seen = 0.0
+
+    def clear(self, level, slot):
+        self.mins[level][slot] = self.maxs[level][slot] = self.avgs[level][slot] = NAN
+        self.counts[level] = 0
+
+    def add(self, level, slot, value):
+        n = self.counts[level] + 1
+        self.counts[level] = n
+        if n == 1:
+            self.mins[level][slot] = self.maxs[level][slot] = self.avgs[level][slot] = value
+            return
+        if value < self.mins[level][slot]:
+            self.mins[level][slot] = value
+        if value > self.maxs[level][slot]:
+            self.maxs[level][slot] = value
+        avg = self.avgs[level][slot]
+        self.avgs[level][slot] = avg + (value - avg) / n
+
+
+def series_group(name):
+    """core (cpu, mem, disk, load, net.up/down), nic (net.<iface>.up/down) or proc (proc.<name>.cpu)."""
+    if name.startswith("proc."):
+        return "proc"
+    if name.startswith("net.") and name.count(".") >= 2:
+        return "nic"
+    return "core"
+
+
+class HistoryStore:
+    """Keeps min/avg/max rollups of every recorded metric in fixed-size tiers."""
+
+    def __init__(self, tiers=TIERS, limits=SERIES_LIMITS):
+        self.tiers = [Tier(step, slots) for step, slots in tiers]
+        self.limits = limits
+        self.series = {}
+        self.groups = {group: set() for group in limits}  # group -> names of its series
+        self.last_ts = 0.0
+
+    def names(self):
+        return sorted(self.series)
+
+    def _get_series(self, name, ts):
+        series = self.series.get(name)
+        if series is None:
+            group = self.groups[series_group(name)]
+            if len(group) >= self.limits[series_group(name)]:
+                # Drop the group's series that has gone without samples the longest (e.g. an exited process).
+                oldest = min(group, key=lambda k: self.series[k].last_seen)
+                if self.series[oldest].last_seen >= ts:
+                    return None
+                del self.series[oldest]
+                group.discard(oldest)
+            series = self.series[name] = Series(self.tiers)
+            group.add(name)
+        series.last_seen = ts
+        return series
+
+    def record(self, ts, values):
+        """Adds one sample per metric in values ({name: number}) taken at unix time ts."""
+        for level, tier in enumerate(self.tiers):
+            bucket = int(ts // tier.step)
+            if bucket < tier.current:
+                continue  # clock went backwards; drop rather than corrupt the ring
+            slot = bucket % tier.slots
+            if bucket != tier.current:
+                tier.current = bucket
+                tier.buckets[slot] = bucket
+                for series in self.series.values():
+                    series.clear(level, slot)
+        for name, value in values.items():
+            if value is None:
+                continue
+            series = self._get_series(name, ts)
+            if series is None:
+                continue
+            for level, tier in enumerate(self.tiers):
+                series.add(level, tier.current % tier.slots, float(value))
+        self.last_ts = max(self.last_ts, ts)
+
+    def pick_tier(self, start):
+        """Finest tier whose retention still reaches back to start."""
+        for level, tier in enumerate(self.tiers):
+            if self.last_ts - start <= tier.retention:
+                return level
+        return len(self.tiers) - 1
+
+    def query(self, name, start, end, step=0):
+        """Returns [[ts, min, avg, max], ...] for name between unix times start and end."""
+        series = self.series.get(name)
+        if series is None:
+            return None
+        level = self.pick_tier(start)
+        tier = self.tiers[level]
+        first = max(int(start // tier.step), tier.current - tier.slots + 1)
+        last = min(int(end // tier.step), tier.current)
+        # Group raw buckets so at most MAX_POINTS points are returned.
+        group = max(1, math.ceil(step / tier.step), math.ceil((last - first + 1) / MAX_POINTS))
+        mins, maxs, avgs = series.mins[level], series.maxs[level], series.avgs[level]
+
+        points = []
+        for group_start in range(first - first % group, last + 1, group):
+            lo, hi, total, n = math.inf, -math.inf, 0.0, 0
+            for bucket in range(max(group_start, first), min(group_start + group, last + 1)):
+                slot = bucket % tier.slots
+                if tier.buckets[slot] != bucket or math.isnan(avgs[slot]):
+                    continue
+                lo = min(lo, mins[slot])
+                hi = max(hi, maxs[slot])
+                total += avgs[slot]
+                n += 1
+            if n:
+                points.append([group_start * tier.step, round(lo, 3), round(total / n, 3), round(hi, 3)])
+        return {"metric": name, "step": tier.step * group, "points": points}
@@ -0,0 +1,164 @@
+"""
+hub.py
+Fleet hub: polls many dashboard agents concurrently and keeps a merged cache.
+
+Every agent gets its own polling task and one keep-alive HTTP/1.1
+connection, each request bounded by HUB_TIMEOUT. Failing agents back off
+exponentially, so one slow or dead host never delays the others, and the
+fleet view is always served from the cache.
+"""
+
+import json
+import time
+import heapq
+import random
+import asyncio
+
+HUB_INTERVAL = 5.0      # seconds between polls of one agent
+HUB_TIMEOUT = 3.0       # per-request deadline
+HUB_MAX_BACKOFF = 60.0
+HUB_CONCURRENCY = 64    # requests in flight at once across all agents
+AGENT_PATH = "/api/stats?fields=sys,usage,net_speed"
+
+
+class AgentClient:
+    """Minimal keep-alive HTTP/1.1 GET client for one agent."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def read_body(self, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    return bytes(body)
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+        if "content-length" in headers:
+            return await self.reader.readexactly(int(headers["content-length"]))
+        return await self.reader.read()
+
+    async def get(self, path):
+        if self.writer is None or self.writer.is_closing():
+            await self.connect()
+        try:
+            self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                              "Accept: application/json\r\nConnection: keep-alive\r\n\r\n".encode())
+            await self.writer.drain()
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError("connection closed by agent")
+            status = int(status_line.split()[1])
+            headers = {}
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await self.read_body(headers)
+            if headers.get("connection", "").lower() == "close":
+                self.close()
+            return status, body
+        except BaseException:
+            # A half-read response leaves the stream unusable; reconnect next time.
+            self.close()
+            raise
+
+
+class Agent:
+    def __init__(self, address):
+        host, _, port = address.rpartition(":")
+        self.address = address
+        self.client = AgentClient(host or "127.0.0.1", int(port))
+        self.snapshot = None
+        self.updated = None   # unix time of the last good poll
+        self.latency = None
+        self.error = None
+        self.failures = 0
+
+    def summary(self):
+        s = self.snapshot or {}
+        usage = s.get("usage", {})
+        return {
+            "agent": self.address,
+            "hostname": s.get("sys", {}).get("hostname"),
+            "os": s.get("sys", {}).get("os"),
+            "uptime": s.get("sys", {}).get("uptime"),
+            "load": s.get("sys", {}).get("load"),
+            "cpu": usage.get("cpu"),
+            "mem": usage.get("mem", {}).get("percent"),
+            "disk": usage.get("disk", {}).get("percent"),
+            "net_speed": s.get("net_speed"),
+            "age": round(time.time() - self.updated, 1) if self.updated else None,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error": self.error,
+        }
+
+
+class Hub:
+    def __init__(self, addresses, interval=HUB_INTERVAL, timeout=HUB_TIMEOUT):
+        self.agents = [Agent(a) for a in addresses]
+        self.interval = interval
+        self.timeout = timeout
+        self.limit = asyncio.Semaphore(HUB_CONCURRENCY)
+        self.tasks = []
+
+    async def poll(self, agent):
+        # Spread the first polls over one interval instead of hitting every agent at once.
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            started = time.monotonic()
+            try:
+                async with self.limit:
+                    status, body = await asyncio.wait_for(agent.client.get(AGENT_PATH), self.timeout)
+                if status != 200:
+                    raise ConnectionError(f"HTTP {status}")
+                agent.snapshot = json.loads(body)
+                agent.updated = time.time()
+                agent.latency = time.monotonic() - started
+                agent.error = None
+                agent.failures = 0
+                delay = self.interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                agent.client.close()
+                agent.failures += 1
+                agent.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                delay = min(HUB_MAX_BACKOFF, self.interval * 2 ** agent.failures)
+            await asyncio.sleep(max(0.0, started + delay - time.monotonic()))
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self.poll(a)) for a in self.agents]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for agent in self.agents:
+            agent.client.close()
+
+    def fleet(self, n=10):
+        """Fleet overview from the cache: every host plus the top n by cpu, mem and disk."""
+        hosts = [a.summary() for a in self.agents]
+        live = [h for h in hosts if h["cpu"] is not None]
+        return {
+            "agents": len(hosts),
+            "reachable": sum(1 for a in self.agents if a.error is None and a.updated),
+            "top": {key: heapq.nlargest(n, live, key=lambda h: h[key] or 0) for key in ("cpu", "mem", "disk")},
+            "hosts": hosts,
+        }
@@ -0,0 +1,126 @@
+"""
+journal.py
+Long-lived `journalctl -f -o json` follower feeding a bounded ring buffer.
+
+One subprocess serves every client: entries are numbered with a local,
+monotonically increasing cursor so readers can ask for "everything after N"
+and filter by unit and priority without spawning anything per request.
+"""
+
+import json
+import time
+import asyncio
+from collections import deque
+from itertools import islice
+
+LOG_BUFFER = 5000     # entries kept in memory
+LOG_BACKLOG = 200     # entries loaded from the journal on first start
+LINE_LIMIT = 1 << 20  # longest journal JSON line accepted
+PRIORITIES = ("emerg", "alert", "crit", "err", "warning", "notice", "info", "debug")
+
+
+def field(value):
+    # journald encodes non-UTF-8 fields as arrays of byte values.
+    if isinstance(value, list):
+        return bytes(value).decode(errors="replace")
+    return value or ""
+
+
+class JournalFollower:
+    def __init__(self, size=LOG_BUFFER):
+        self.entries = deque(maxlen=size)
+        self.cursor = 0             # local cursor of the newest entry
+        self.journal_cursor = None  # journald cursor, to resume without duplicates after a restart
+        self.error = None
+        self.task = None
+        self.proc = None
+
+    def add(self, raw):
+        try:
+            rec = json.loads(raw)
+        except ValueError:
+            return
+        self.journal_cursor = rec.get("__CURSOR", self.journal_cursor)
+        ts = int(rec.get("__REALTIME_TIMESTAMP", 0)) / 1e6 or time.time()
+        unit = field(rec.get("_SYSTEMD_UNIT")) or field(rec.get("SYSLOG_IDENTIFIER"))
+        ident = field(rec.get("SYSLOG_IDENTIFIER")) or unit or field(rec.get("_COMM"))
+        pid = field(rec.get("_PID"))
+        host = field(rec.get("_HOSTNAME"))
+        message = field(rec.get("MESSAGE"))
+        try:
+            priority = int(rec.get("PRIORITY", 6))
+        except ValueError:
+            priority = 6
+        self.cursor += 1
+        self.entries.append({
+            "cursor": self.cursor,
+            "ts": ts,
+            "unit": unit,
+            "priority": priority,
+            "message": message,
+            "line": " ".join(filter(None, (time.strftime("%b %d %H:%M:%S", time.localtime(ts)), host,
+                                           f"{ident}{f'[{pid}]' if pid else ''}: {message}"))),
+        })
+        self.error = None
+
+    async def run(self):
+        backoff = 1
+        while True:
+            cmd = ["journalctl", "-f", "-o", "json", "--no-pager", "-q"]
+            cmd += [f"--after-cursor={self.journal_cursor}"] if self.journal_cursor else ["-n", str(LOG_BACKLOG)]
+            try:
+                self.proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL, limit=LINE_LIMIT)
+            except FileNotFoundError:
+                self.error = "journalctl not found on this system."
+                return
+            async for line in self.proc.stdout:
+                self.add(line)
+                backoff = 1
+            await self.proc.wait()
+            if not self.entries:
+                self.error = "Log access denied. Try running with sudo."
+            # journalctl exited (rotation, permissions, killed): restart with backoff.
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        if self.proc and self.proc.returncode is None:
+            self.proc.terminate()
+            await self.proc.wait()
+
+    def tail(self, n=8):
+        if not self.entries:
+            return [self.error or "Waiting for journal entries..."]
+        return [e["line"] for e in islice(self.entries, max(0, len(self.entries) - n), None)]
+
+    def read(self, after=0, unit=None, priority=None, limit=200):
+        """Entries newer than cursor `after`, optionally only one unit and priority <= priority."""
+        if after > self.cursor:
+            after = 0  # cursor from before a dashboard restart; start over
+        first = self.cursor - len(self.entries) + 1
+        start = max(0, after - first + 1)
+        out = []
+        cursor = max(after, first - 1)
+        for entry in islice(self.entries, start, None):
+            cursor = entry["cursor"]
+            if unit and entry["unit"] != unit:
+                continue
+            if priority is not None and entry["priority"] > priority:
+                continue
+            out.append(entry)
+            if len(out) >= limit:
+                break
+        else:
+            cursor = max(after, self.cursor)
+        return {
+            "cursor": cursor,
+            "dropped": after + 1 < first,  # entries the reader never saw fell out of the buffer
+            "entries": out,
+            "error": self.error,
+        }
@@ -2,38 +2,70 @@ import psutil
 import socket
 import getpass
 import time
+import json
 import shutil
+import asyncio
+import argparse
 import platform
-import subprocess
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+
+from alerts import AlertEngine, Context as AlertContext, load_config as load_alerts
+from archive import Archive
+from assets import IMMUTABLE, Bundle
+from cgroups import CgroupTable
+from devstats import DeviceStats, SECTOR
+from encoding import MIN_COMPRESS, Formatted, compact, compress, msgpack, negotiate
+from filesystems import FilesystemTable
+from history import HistoryStore
+from hub import Hub
+from journal import JournalFollower, PRIORITIES
+from openmetrics import CONTENT_TYPE as OPENMETRICS_TYPE, render as render_openmetrics
+from perf import Histogram, timed
+from ports import PortIndex
+from proctable import ProcTable, CLK_TCK
+from recording import Recorder, Replayer
 
 app = FastAPI(title="Linux Pro Dashboard")
+# Compresses the remaining JSON routes; responses that already carry a Content-Encoding
+# (the per-tick cached snapshot bodies, the page) and event streams are left alone.
+app.add_middleware(GZipMiddleware, minimum_size=MIN_COMPRESS)
 
-# Global Cache for network calculations
 BOOT_TIME = psutil.boot_time()
-NET_IO_PREV = psutil.net_io_counters()
-NET_TIME_PREV = time.time()
+SAMPLE_INTERVAL = 2.0  # seconds between two sampler ticks
+STREAM_KEEPALIVE = 15.0  # seconds of silence before an SSE comment is sent
+HISTORY_TOP_PROCS = 3  # top processes whose CPU is kept in history
+DEMAND_WINDOW = 30.0  # seconds a section stays sampled after a client last asked for it
+IDLE_INTERVAL = 60.0  # seconds between heartbeat ticks while nobody watches or polls
+COLLECTOR_DEADLINE = 1.0  # default seconds a tick waits for one collector before using its last value
 
 def get_size(bytes, suffix="B"):
     factor = 1024
+    raw = bytes
     for unit in ["", "K", "M", "G", "T", "P"]:
         if bytes < factor:
-            return f"{bytes:.2f}{unit}{suffix}"
+            return Formatted(f"{bytes:.2f}{unit}{suffix}", raw)
         bytes /= factor
 
-def get_network_speed():
-    global NET_IO_PREV, NET_TIME_PREV
-    now = time.time()
-    net = psutil.net_io_counters()
-    interval = now - NET_TIME_PREV
-    
-    sent = (net.bytes_sent - NET_IO_PREV.bytes_sent) / interval
-    recv = (net.bytes_recv - NET_IO_PREV.bytes_recv) / interval
-    
-    NET_IO_PREV = net
-    NET_TIME_PREV = now
-    return {"up": get_size(sent) + "/s", "down": get_size(recv) + "/s"}
+def get_rate(bytes_per_second):
+    return Formatted(get_size(bytes_per_second) + "/s", round(bytes_per_second, 1))
+
+def diff(old, new):
+    """Returns the fields of new that differ from old; removed keys map to None."""
+    delta = {}
+    for key, value in new.items():
+        prev = old.get(key)
+        if prev == value and key in old:
+            continue
+        if isinstance(value, dict) and isinstance(prev, dict):
+            value = diff(prev, value)
+        delta[key] = value
+    for key in old.keys() - new.keys():
+        delta[key] = None
+    return delta
 
 def get_network_info():
     """Gets the active interface and IP address."""
@@ -49,277 +81,756 @@ def get_network_info():
             if ip_addr != "127.0.0.1": break
     return {"interface": iface_name, "ip": ip_addr}
 
-def get_system_logs():
-    """Fetches recent system logs using journalctl."""
+def get_top_processes(table, key="cpu", n=10):
+    return [{"pid": e.pid, "name": e.name, "cpu_percent": e.cpu_percent, "mem": get_size(e.rss),
+             "io": get_rate(e.io_rate), "threads": e.threads}
+            for e in table.top(key, n)]
+
+def get_top_units(table, key="cpu", n=10):
+    return [{"name": u.name, "path": u.path, "cpu_percent": u.cpu_percent, "mem": get_size(u.mem),
+             "io": get_rate(u.io_rate), "pids": u.pids}
+            for u in table.top(key, n)]
+
+RTMGRP_LINK, RTMGRP_IPV4_IFADDR, RTMGRP_IPV6_IFADDR = 0x1, 0x10, 0x100
+
+def open_netlink():
+    """Non-blocking rtnetlink socket that becomes readable on link/address changes."""
     try:
-        # Get last 8 lines of system logs
-        logs = subprocess.check_output(["journalctl", "-n", "8", "--no-pager", "-q"]).decode('utf-8')
-        return logs.strip().split('\n')
-    except Exception:
-        return ["Log access denied. Try running with sudo."]
-
-def get_top_processes():
-    procs = []
-    for p in sorted(psutil.process_iter(['pid', 'name', 'cpu_percent']), 
-                   key=lambda x: x.info['cpu_percent'], reverse=True)[:10]:
-        procs.append(p.info)
-    return procs
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+        sock.setblocking(False)
+        return sock
+    except (OSError, AttributeError):
+        return None
 
-@app.get("/api/stats")
-def stats():
-    mem = psutil.virtual_memory()
-    disk = shutil.disk_usage("/")
-    uptime_seconds = int(time.time() - BOOT_TIME)
-    net_info = get_network_info()
-
-    return {
-        "sys": {
-            "hostname": socket.gethostname(),
+class Collector:
+    """One independently scheduled part of the snapshot.
+
+    fn returns (fragment, metrics, raw): fragment is merged into the snapshot's
+    top-level sections, metrics ({name: number}) feed history and the archive,
+    and raw is a list of unformatted (family, labels, value) samples for /metrics.
+    ttl is the refresh period in seconds (0 = every tick, None = only when
+    invalidate() says so). Unless always is set, a collector only runs while
+    some client has asked for one of its sections within DEMAND_WINDOW.
+    Threaded collectors run concurrently; one that misses its deadline keeps
+    its last good value, is reported as stale and is not restarted until the
+    hung call returns.
+    """
+
+    def __init__(self, name, fn, sections, ttl=0.0, always=False, invalidate=None, threaded=True,
+                 deadline=COLLECTOR_DEADLINE):
+        self.name = name
+        self.fn = fn
+        self.sections = sections
+        self.ttl = ttl
+        self.always = always
+        self.invalidate = invalidate
+        self.threaded = threaded
+        self.deadline = deadline
+        self.future = None  # in-flight threaded run
+        self.stale = False
+        self.error = None
+        self.fragment = {}
+        self.metrics = {}
+        self.raw = []
+        self.updated = None
+        self.wanted = 0.0
+        self.perf = Histogram()
+        self.timeouts = 0
+
+    def due(self, now, watched=False):
+        if self.future is not None:
+            return False
+        if not self.always and not watched:
+            # Only polled: refresh at most once per request, so the rate follows the pollers.
+            if now - self.wanted > DEMAND_WINDOW or (self.updated is not None and self.wanted <= self.updated):
+                return False
+        if self.updated is None or (self.invalidate and self.invalidate()):
+            return True
+        # Small slack so a 10 s ttl on a 2 s tick refreshes every 5th tick, not every 6th.
+        return self.ttl is not None and now - self.updated >= self.ttl - 0.25
+
+    def run(self, now):
+        with timed(self.perf):
+            self.fragment, self.metrics, self.raw = self.fn()
+        self.updated = now
+
+    def finish(self):
+        """Collects the outcome of a completed threaded run."""
+        error = self.future.exception()
+        self.future = None
+        self.stale = error is not None
+        self.error = f"{type(error).__name__}: {error}" if error else None
+        if error:
+            print(f"[sampler] {self.name} collector failed: {self.error}")
+
+class Sampler:
+    """Runs the registered collectors on their own schedules and publishes the result as a snapshot.
+
+    The snapshot dict and its pre-encoded JSON body are replaced wholesale on each
+    tick and never mutated afterwards, so request handlers can read them without locks.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.snapshot = {}
+        self.body = b"{}"
+        self.delta_body = b"{}"
+        self.metrics_body = render_openmetrics([])
+        self.version = 0
+        self.changed = asyncio.Event()
+        self.wake = asyncio.Event()
+        self.subscribers = 0  # open /api/stream connections; each one watches every section
+        self.demand = 0.0     # monotonic time of the last poll or scrape
+        self.bodies = {}  # (fields, format, encoding) -> body, built on first request per tick
+        self.perf = {name: Histogram() for name in ("tick", "serialize", "compress", "openmetrics", "history", "alerts")}
+        self.process = psutil.Process()
+        self.devices = DeviceStats()
+        self.netlink = open_netlink()
+        self.hostname = None
+        self.procs = ProcTable()
+        self.ports = PortIndex()
+        self.filesystems = FilesystemTable()
+        self.cgroups = CgroupTable()
+        self.journal = JournalFollower()
+        self.history = HistoryStore()
+        self.archive = None
+        self.alerts = None    # AlertEngine; rules from --alerts or ALERTS_FILE, loaded on start
+        self.ports_seen = None  # ports collector run the alert rules last looked at
+        self.recorder = None  # set by --record
+        self.replayer = None  # set by --replay: snapshots come from a capture instead of the collectors
+        self.task = None
+        self.pool = None
+
+        self.collectors = {c.name: c for c in (
+            Collector("static", self.collect_static, ("sys",), ttl=None, invalidate=self.static_changed),
+            Collector("load", self.collect_load, ("sys",), always=True),
+            Collector("devices", self.collect_devices, ("usage", "net_speed", "cores", "nics", "blockdev"), always=True),
+            Collector("mem", self.collect_mem, ("usage",), always=True),
+            Collector("disk", self.collect_disk, ("usage",), ttl=30, always=True, deadline=1.5),
+            Collector("filesystems", self.collect_filesystems, ("filesystems",), ttl=5),
+            Collector("procs", self.collect_procs, ("procs", "procs_by"), deadline=1.5),
+            Collector("units", self.collect_units, ("units", "units_by"), deadline=1.5),
+            Collector("ports", self.collect_ports, ("ports",), ttl=10, deadline=1.5),
+            Collector("logs", self.collect_logs, ("logs", "log_cursor"), threaded=False),
+        )}
+        self.sections = {}
+        for c in self.collectors.values():
+            for section in c.sections:
+                self.sections.setdefault(section, []).append(c)
+        self.sections["alerts"] = []  # filled in by the alert engine, not by a collector
+
+    def static_changed(self):
+        """True after a netlink link/address event or a hostname change."""
+        changed = socket.gethostname() != self.hostname
+        if self.netlink is None:
+            return changed
+        while True:
+            try:
+                self.netlink.recv(65536)
+                changed = True
+            except BlockingIOError:
+                return changed
+            except OSError:
+                return True  # ENOBUFS: events were lost, refresh to be safe
+
+    def collect_static(self):
+        self.hostname = socket.gethostname()
+        info = {
+            "hostname": self.hostname,
             "user": getpass.getuser(),
             "os": f"{platform.system()} {platform.release()}",
-            "uptime": f"{uptime_seconds // 3600}h {(uptime_seconds % 3600) // 60}m",
-            "load": psutil.getloadavg(),
-            "net_info": net_info
-        },
-        "usage": {
-            "cpu": psutil.cpu_percent(interval=None),
+            "net_info": get_network_info(),
+        }
+        return {"sys": info}, {}, [
+            ("pulse_host", {"hostname": info["hostname"], "user": info["user"], "os": info["os"],
+                            "interface": info["net_info"]["interface"], "ip": info["net_info"]["ip"]}, 1),
+        ]
+
+    def collect_load(self):
+        uptime_seconds = int(time.time() - BOOT_TIME)
+        load = psutil.getloadavg()
+        return {"sys": {
+            "uptime": Formatted(f"{uptime_seconds // 3600}h {(uptime_seconds % 3600) // 60}m", uptime_seconds),
+            "load": load,
+        }}, {"load1": load[0], "load5": load[1], "load15": load[2]}, [
+            ("pulse_boot_time_seconds", {}, BOOT_TIME),
+            ("pulse_load1", {}, load[0]), ("pulse_load5", {}, load[1]), ("pulse_load15", {}, load[2]),
+        ]
+
+    def collect_devices(self):
+        """CPU, per-core, per-NIC and per-disk rates from one read of /proc/stat, net/dev and diskstats."""
+        dev = self.devices.update()
+        sent = sum(n["tx_rate"] for n in dev["nics"])
+        recv = sum(n["rx_rate"] for n in dev["nics"])
+        metrics = {"cpu": dev["cpu"], "net.up": sent, "net.down": recv}
+        nics = []
+        for n in dev["nics"]:
+            # Skip loopback and interfaces that never carried traffic; they only add noise.
+            if n["name"].startswith("lo") or not n["active"]:
+                continue
+            metrics[f"net.{n['name']}.up"] = n["tx_rate"]
+            metrics[f"net.{n['name']}.down"] = n["rx_rate"]
+            nics.append({"name": n["name"], "rx": get_rate(n["rx_rate"]), "tx": get_rate(n["tx_rate"]),
+                         "rx_rate": round(n["rx_rate"]), "tx_rate": round(n["tx_rate"]),
+                         "errs": n["errs"], "drops": n["drops"], "err_rate": round(n["err_rate"], 2)})
+        blockdev = [{"name": d["name"], "r_iops": round(d["r_iops"], 1), "w_iops": round(d["w_iops"], 1),
+                     "read": get_rate(d["r_bps"]), "write": get_rate(d["w_bps"]),
+                     "r_bps": round(d["r_bps"]), "w_bps": round(d["w_bps"]), "util": round(d["util"], 1)}
+                    for d in dev["disks"]]
+        # Raw counters straight from the same read, for /metrics.
+        cpus, nic_counters, disk_counters = self.devices.prev
+        raw = [("pulse_cpu_usage_percent", {}, dev["cpu"])]
+        for cpu, (busy, total) in cpus.items():
+            label = {"cpu": cpu[3:] or "all"}
+            raw += [("pulse_cpu_busy_seconds", label, busy / CLK_TCK), ("pulse_cpu_seconds", label, total / CLK_TCK)]
+        for nic, (rx, tx, errs, drops) in nic_counters.items():
+            label = {"device": nic}
+            raw += [("pulse_network_receive_bytes", label, rx), ("pulse_network_transmit_bytes", label, tx),
+                    ("pulse_network_errors", label, errs), ("pulse_network_drops", label, drops)]
+        for disk, (r, rs, w, ws, io_ms) in disk_counters.items():
+            label = {"device": disk}
+            raw += [("pulse_disk_reads_completed", label, r), ("pulse_disk_writes_completed", label, w),
+                    ("pulse_disk_read_bytes", label, rs * SECTOR), ("pulse_disk_written_bytes", label, ws * SECTOR),
+                    ("pulse_disk_io_time_seconds", label, io_ms / 1000)]
+        return {
+            "usage": {"cpu": dev["cpu"]},
+            "net_speed": {"up": get_rate(sent), "down": get_rate(recv)},
+            "cores": dev["cores"],
+            "nics": nics,
+            "blockdev": blockdev,
+        }, metrics, raw
+
+    def collect_mem(self):
+        mem = psutil.virtual_memory()
+        return {"usage": {
             "mem": {"percent": mem.percent, "used": get_size(mem.used), "total": get_size(mem.total)},
-            "disk": {"percent": round((disk.used/disk.total)*100, 1), "used": get_size(disk.used), "total": get_size(disk.total)}
-        },
-        "net_speed": get_network_speed(),
-        "procs": get_top_processes(),
-        "logs": get_system_logs(),
-        "ports": [{"p": c.laddr.port, "n": psutil.Process(c.pid).name() if c.pid else "?"} 
-                  for c in psutil.net_connections(kind="inet") if c.status == "LISTEN"][:10]
-    }
+        }}, {"mem": mem.percent}, [
+            ("pulse_memory_total_bytes", {}, mem.total), ("pulse_memory_used_bytes", {}, mem.used),
+            ("pulse_memory_available_bytes", {}, mem.available),
+        ]
 
-@app.get("/", response_class=HTMLResponse)
-def ui():
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>System Pulse</title>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-    <script src="https://unpkg.com/lucide@latest"></script>
-    <style>
-        :root {
-            --bg: #030712;
-            --card-bg: rgba(31, 41, 55, 0.4);
-            --accent: #3b82f6;
-            --text: #f3f4f6;
-        }
-        body {
-            font-family: 'Inter', system-ui, sans-serif;
-            background-color: var(--bg);
-            background-image: radial-gradient(circle at 50% 0%, #1e293b 0%, #030712 100%);
-            color: var(--text);
-            margin: 0; padding: 24px; min-height: 100vh;
-        }
-        .bento-grid {
-            display: grid;
-            grid-template-columns: repeat(4, 1fr);
-            grid-auto-rows: minmax(160px, auto);
-            gap: 16px; max-width: 1200px; margin: 0 auto;
-        }
-        .card {
-            background: var(--card-bg);
-            backdrop-filter: blur(12px);
-            border: 1px solid rgba(255,255,255,0.1);
-            border-radius: 24px;
-            padding: 20px;
-            transition: transform 0.2s ease;
-        }
-        .card:hover { transform: translateY(-2px); border-color: var(--accent); }
-        .span-2 { grid-column: span 2; }
-        .span-4 { grid-column: span 4; }
-        
-        .stat-val { font-size: 24px; font-weight: 700; margin-top: 8px; color: var(--accent); }
-        .label { font-size: 12px; text-transform: uppercase; opacity: 0.6; letter-spacing: 1px; display: flex; align-items: center; gap: 6px; }
-        
-        .chart-container { position: relative; height: 120px; width: 120px; margin: 10px auto; }
-        .chart-label { position: absolute; top: 50%; left: 50%; transform: translate(-50%, -50%); font-weight: bold; font-size: 14px; }
-        
-        table { width: 100%; border-collapse: collapse; margin-top: 10px; font-size: 13px; }
-        th { text-align: left; opacity: 0.5; padding-bottom: 8px; }
-        td { padding: 6px 0; border-top: 1px solid rgba(255,255,255,0.05); }
-        .badge { background: #1e293b; padding: 2px 8px; border-radius: 6px; font-family: monospace; }
-        
-        .log-box { background: rgba(0,0,0,0.3); padding: 15px; border-radius: 12px; font-family: 'Fira Code', monospace; font-size: 11px; color: #94a3b8; overflow-x: auto; border: 1px solid rgba(255,255,255,0.05); }
-        .log-line { margin-bottom: 4px; border-left: 2px solid var(--accent); padding-left: 10px; }
-
-        .header { display: flex; justify-content: space-between; align-items: center; margin-bottom: 24px; max-width: 1200px; margin-inline: auto; }
-    </style>
-</head>
-<body>
-
-<div class="header">
-    <div>
-        <h1 style="margin:0; font-size: 24px;"><img style="height:24px; width:24px;" src="https://raw.githubusercontent.com/Pings-Lab/Linux-Utilities/main/ping.jpg" alt="pingslab"/>Ping's Lab</h1>
-        <div id="os-info" style="opacity: 0.6; font-size: 14px;">Loading system...</div>
-    </div>
-    <div style="text-align: right">
-        <div id="uptime" class="badge">--</div>
-        <div style="font-size: 12px; margin-top: 4px; opacity: 0.5;">UPTIME</div>
-    </div>
-</div>
-
-<div class="bento-grid">
-    <!-- Row 1: Quick Stats -->
-    <div class="card">
-        <div class="label"><i data-lucide="user"></i> User</div>
-        <div id="username" class="stat-val">--</div>
-    </div>
-    <div class="card">
-        <div class="label"><i data-lucide="wifi"></i> Network Info</div>
-        <div id="net-iface" class="stat-val" style="font-size: 18px;">--</div>
-        <div id="net-ip" style="font-size: 12px; opacity: 0.6; margin-top: 4px;">0.0.0.0</div>
-    </div>
-    <div class="card">
-        <div class="label"><i data-lucide="download"></i> Download</div>
-        <div id="down" class="stat-val">0 KB/s</div>
-    </div>
-    <div class="card">
-        <div class="label"><i data-lucide="upload"></i> Upload</div>
-        <div id="up" class="stat-val">0 KB/s</div>
-    </div>
-
-    <!-- Row 2: Charts -->
-    <div class="card">
-        <div class="label">CPU Usage</div>
-        <div class="chart-container">
-            <canvas id="cpuChart"></canvas>
-            <div class="chart-label" id="cpu-text">0%</div>
-        </div>
-    </div>
-    <div class="card">
-        <div class="label">Memory</div>
-        <div class="chart-container">
-            <canvas id="memChart"></canvas>
-            <div class="chart-label" id="mem-text">0%</div>
-        </div>
-        <div id="mem-detail" style="font-size: 10px; text-align: center; opacity: 0.6">-- / --</div>
-    </div>
-    <div class="card">
-        <div class="label">Disk Usage</div>
-        <div class="chart-container">
-            <canvas id="diskChart"></canvas>
-            <div class="chart-label" id="disk-text">0%</div>
-        </div>
-        <div id="disk-detail" style="font-size: 10px; text-align: center; opacity: 0.6">-- / --</div>
-    </div>
-    <div class="card">
-        <div class="label"><i data-lucide="activity"></i> Load Avg</div>
-        <div id="load-avg" class="stat-val" style="font-size: 18px; margin-top: 15px;">--</div>
-    </div>
-
-    <!-- Row 3: Lists -->
-    <div class="card span-2">
-        <div class="label"><i data-lucide="cpu"></i> Top Processes</div>
-        <table id="proc-table">
-            <thead><tr><th>PID</th><th>Process</th><th>CPU%</th></tr></thead>
-            <tbody></tbody>
-        </table>
-    </div>
-    <div class="card span-2">
-        <div class="label"><i data-lucide="shield"></i> Listening Ports</div>
-        <table id="port-table">
-            <thead><tr><th>Port</th><th>Service</th></tr></thead>
-            <tbody></tbody>
-        </table>
-    </div>
-
-    <!-- Row 4: Logs -->
-    <div class="card span-4">
-        <div class="label"><i data-lucide="terminal"></i> Recent System Logs (journalctl)</div>
-        <div id="log-container" class="log-box">
-            Loading logs...
-        </div>
-    </div>
-</div>
-
-<script>
-    lucide.createIcons();
-    
-    function createChart(id, color) {
-        return new Chart(document.getElementById(id), {
-            type: 'doughnut',
-            data: {
-                datasets: [{
-                    data: [0, 100],
-                    backgroundColor: [color, 'rgba(255,255,255,0.05)'],
-                    borderWidth: 0,
-                    borderRadius: 10,
-                }]
+    def collect_disk(self):
+        disk = shutil.disk_usage("/")
+        disk_percent = round((disk.used/disk.total)*100, 1)
+        return {"usage": {
+            "disk": {"percent": disk_percent, "used": get_size(disk.used), "total": get_size(disk.total)},
+        }}, {"disk": disk_percent}, []
+
+    def collect_filesystems(self):
+        """Bytes and inodes of every real mount; hung mounts keep their last values."""
+        rows, raw = [], []
+        for m in self.filesystems.update():
+            row = {"mount": m.point, "device": m.device, "fstype": m.fstype, "network": m.network,
+                   "hung": m.hung, "error": m.error}
+            u = m.usage
+            if u is not None:
+                total, free, avail = u.f_blocks * u.f_frsize, u.f_bfree * u.f_frsize, u.f_bavail * u.f_frsize
+                used = total - free
+                # Same definition as df: reserved blocks count neither as used nor available.
+                row.update({"size": get_size(total), "used": get_size(used), "avail": get_size(avail),
+                            "percent": round(100 * used / (used + avail), 1) if used + avail else 0.0,
+                            "inodes": u.f_files, "inodes_used": u.f_files - u.f_ffree,
+                            "inodes_percent": round(100 * (u.f_files - u.f_ffree) / u.f_files, 1) if u.f_files else 0.0})
+                label = {"mountpoint": m.point, "device": m.device, "fstype": m.fstype}
+                raw += [("pulse_filesystem_size_bytes", label, total), ("pulse_filesystem_used_bytes", label, used),
+                        ("pulse_filesystem_free_bytes", label, avail), ("pulse_filesystem_files", label, u.f_files),
+                        ("pulse_filesystem_files_free", label, u.f_ffree)]
+            rows.append(row)
+        rows.sort(key=lambda r: r["mount"])
+        return {"filesystems": rows}, {}, raw
+
+    def collect_procs(self):
+        self.procs.update()
+        procs = get_top_processes(self.procs)
+        metrics = {f"proc.{p['name']}.cpu": p["cpu_percent"] for p in procs[:HISTORY_TOP_PROCS]}
+        raw = [("pulse_processes", {}, len(self.procs.entries))]
+        for e in self.procs.top("cpu"):
+            label = {"pid": e.pid, "name": e.name}
+            raw += [("pulse_process_cpu_seconds", label, e.ticks / CLK_TCK), ("pulse_process_cpu_percent", label, e.cpu_percent),
+                    ("pulse_process_resident_bytes", label, e.rss), ("pulse_process_threads", label, e.threads)]
+        return {
+            "procs": procs,
+            "procs_by": {key: get_top_processes(self.procs, key) for key in ("mem", "io", "threads")},
+        }, metrics, raw
+
+    def collect_units(self):
+        """Per systemd unit / container usage from cgroup v2: a few reads per unit, no pid walk."""
+        units = self.cgroups.update()
+        raw = [("pulse_units", {}, len(units))]
+        for u in units:
+            label = {"unit": u.path}
+            raw += [("pulse_unit_cpu_seconds", label, u.usage_usec / 1e6), ("pulse_unit_memory_bytes", label, u.mem),
+                    ("pulse_unit_read_bytes", label, u.rbytes), ("pulse_unit_written_bytes", label, u.wbytes),
+                    ("pulse_unit_pids", label, u.pids)]
+        return {
+            "units": get_top_units(self.cgroups),
+            "units_by": {key: get_top_units(self.cgroups, key) for key in ("mem", "io", "pids")},
+        }, {}, raw
+
+    def collect_ports(self):
+        listeners = self.ports.update()
+        raw = [("pulse_listening_sockets", {}, len(listeners))]
+        # SO_REUSEPORT and pre-forked workers share a label set; one series per set, counting its sockets.
+        counts = Counter((l["proto"], l["addr"], l["port"], l["name"]) for l in listeners)
+        raw += [("pulse_listener_sockets", {"proto": proto, "addr": addr, "port": port, "name": name}, n)
+                for (proto, addr, port, name), n in counts.items()]
+        return {"ports": [{"p": l["port"], "n": l["name"]} for l in listeners if l["proto"].startswith("tcp")][:10]}, {}, raw
+
+    def collect_logs(self):
+        # The journal ring is only touched from the event loop, so this collector runs there.
+        return {"logs": self.journal.tail(), "log_cursor": self.journal.cursor}, {}, [
+            ("pulse_journal_entries", {}, self.journal.cursor),
+        ]
+
+    def active(self, now):
+        return self.replayer is not None or self.subscribers > 0 or now - self.demand <= DEMAND_WINDOW
+
+    def want(self, sections=None):
+        """Records that a client wants these sections (all when None) kept fresh.
+
+        Returns True when this woke an idle sampler, i.e. the snapshot may be old.
+        """
+        now = time.monotonic()
+        idle = not self.active(now)
+        self.demand = now
+        for section in sections or self.sections:
+            for c in self.sections[section]:
+                c.wanted = now
+        if idle:
+            self.wake.set()
+        return idle
+
+    def subscribe(self):
+        if not self.active(time.monotonic()):
+            self.wake.set()
+        self.subscribers += 1
+
+    def unsubscribe(self):
+        self.subscribers -= 1
+
+    async def fresh(self):
+        """Waits (briefly) for the tick a woken sampler is about to run."""
+        try:
+            await asyncio.wait_for(self.changed.wait(), 2 * COLLECTOR_DEADLINE)
+        except asyncio.TimeoutError:
+            pass
+
+    async def await_collector(self, c):
+        await asyncio.wait({c.future}, timeout=c.deadline)
+        if c.future.done():
+            c.finish()
+        else:
+            c.stale = True
+            c.error = f"timed out after {c.deadline}s"
+            c.timeouts += 1
+
+    async def run_collectors(self, due, now):
+        """Runs due collectors concurrently; the tick waits at most for the slowest deadline."""
+        loop = asyncio.get_running_loop()
+        for c in self.collectors.values():
+            # A run that missed an earlier deadline may have finished since.
+            if c.future is not None and c.future.done():
+                c.finish()
+        threaded = [c for c in due if c.threaded]
+        for c in threaded:
+            c.future = loop.run_in_executor(self.pool, c.run, now)
+        for c in due:
+            if not c.threaded:
+                try:
+                    c.run(now)
+                    c.stale, c.error = False, None
+                except Exception as e:
+                    c.stale, c.error = True, f"{type(e).__name__}: {e}"
+                    print(f"[sampler] {c.name} collector failed: {c.error}")
+        await asyncio.gather(*(self.await_collector(c) for c in threaded))
+
+    def assemble(self):
+        snapshot = {}
+        for c in self.collectors.values():
+            for section, value in c.fragment.items():
+                if isinstance(value, dict):
+                    snapshot.setdefault(section, {}).update(value)
+                else:
+                    snapshot[section] = value
+        snapshot["stale"] = {c.name: c.error for c in self.collectors.values() if c.stale}
+        if self.alerts:
+            snapshot["alerts"] = self.alerts.firing()
+        return snapshot
+
+    def publish(self, snapshot):
+        # Encode once per tick; every stream client shares the same bytes.
+        with timed(self.perf["serialize"]):
+            self.delta_body = json.dumps(diff(self.snapshot, snapshot)).encode()
+            self.body = json.dumps(snapshot).encode()
+        self.snapshot = snapshot
+        self.version += 1
+        # Only this tick's bodies are kept, however many field/format/encoding variants were asked for.
+        self.bodies = {}
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def encoded(self, fields=(), fmt="json", encoding=None):
+        """Snapshot body (all sections, or only `fields`) in fmt and encoding, built once per tick.
+
+        fmt "compact" and "msgpack" carry raw numbers instead of the display strings.
+        """
+        key = (fields, fmt, encoding)
+        cached = self.bodies.get(key)
+        if cached is not None:
+            return cached
+        if encoding:
+            with timed(self.perf["compress"]):
+                body = compress(self.encoded(fields, fmt), encoding)
+        elif not fields and fmt == "json":
+            body = self.body
+        else:
+            data = {f: self.snapshot[f] for f in fields + ("stale",) if f in self.snapshot} if fields else self.snapshot
+            with timed(self.perf["serialize"]):
+                if fmt == "json":
+                    body = json.dumps(data).encode()
+                elif fmt == "compact":
+                    body = json.dumps(compact(data), separators=(",", ":")).encode()
+                else:
+                    body = msgpack.packb(compact(data))
+        self.bodies[key] = body
+        return body
+
+    def encoded_metrics(self, encoding=None):
+        if not encoding:
+            return self.metrics_body
+        cached = self.bodies.get(("metrics", encoding))
+        if cached is not None:
+            return cached
+        with timed(self.perf["compress"]):
+            body = compress(self.metrics_body, encoding)
+        self.bodies[("metrics", encoding)] = body
+        return body
+
+    async def tick(self):
+        try:
+            with timed(self.perf["tick"]):
+                now = time.monotonic()
+                watched = self.subscribers > 0
+                due = [c for c in self.collectors.values() if c.due(now, watched)]
+                await self.run_collectors(due, now)
+                metrics = {}
+                for c in self.collectors.values():
+                    metrics.update(c.metrics)
+                ts = time.time()
+                if self.alerts:
+                    with timed(self.perf["alerts"]):
+                        self.evaluate_alerts(ts, metrics)
+                self.publish(self.assemble())
+                with timed(self.perf["openmetrics"]):
+                    self.metrics_body = render_openmetrics(s for c in self.collectors.values() for s in c.raw)
+                with timed(self.perf["history"]):
+                    self.history.record(ts, metrics)
+                    if self.archive:
+                        self.archive.append(ts, metrics)
+                    if self.recorder:
+                        self.recorder.write(ts, self.body, self.delta_body, metrics)
+        except Exception as e:
+            print(f"[sampler] collection failed: {e}")
+
+    def evaluate_alerts(self, ts, metrics):
+        # Port rules only look at the listener list when the ports collector has refreshed it.
+        ports = self.collectors["ports"]
+        listeners = None
+        if ports.updated is not None and ports.updated != self.ports_seen and not ports.stale:
+            listeners, self.ports_seen = self.ports.listeners, ports.updated
+        self.alerts.evaluate(ts, AlertContext(metrics, listeners, self.journal))
+
+    async def run(self):
+        # Full rate while someone streams or polled recently; otherwise a slow heartbeat
+        # that keeps history and the archive going until a client wakes the sampler up.
+        started = time.monotonic()
+        while True:
+            interval = self.interval if self.active(time.monotonic()) else IDLE_INTERVAL
+            try:
+                await asyncio.wait_for(self.wake.wait(), max(0.0, started + interval - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            started = time.monotonic()
+            await self.tick()
+
+    def perf_report(self):
+        """Collector and tick latency histograms plus the dashboard's own footprint."""
+        collectors = {}
+        for c in self.collectors.values():
+            collectors[c.name] = {**c.perf.summary(), "timeouts": c.timeouts, "stale": c.stale}
+        with self.process.oneshot():
+            mem = self.process.memory_info()
+            proc = {
+                # CPU since the previous report (or since start for the first one).
+                "cpu_percent": self.process.cpu_percent(None),
+                "rss": mem.rss,
+                "rss_h": get_size(mem.rss),
+                "threads": self.process.num_threads(),
+                "cpu_seconds": round(sum(self.process.cpu_times()[:2]), 2),
+            }
+        return {
+            "process": proc,
+            "sampler": {
+                "interval": self.interval,
+                "active": self.active(time.monotonic()),
+                "subscribers": self.subscribers,
+                "version": self.version,
+                "snapshot_bytes": len(self.body),
+                "delta_bytes": len(self.delta_body),
+                "metrics_bytes": len(self.metrics_body),
+                **{name: h.summary() for name, h in self.perf.items()},
             },
-            options: { cutout: '85%', plugins: { legend: { display: false } }, events: [] }
-        });
-    }
-
-    const charts = {
-        cpu: createChart('cpuChart', '#3b82f6'),
-        mem: createChart('memChart', '#a855f7'),
-        disk: createChart('diskChart', '#10b981')
-    };
-
-    async function update() {
-        try {
-            const res = await fetch('/api/stats');
-            const d = await res.json();
-
-            // Header & Quick Stats
-            document.getElementById('os-info').innerText = `${d.sys.os} | ${d.sys.hostname}`;
-            document.getElementById('username').innerText = d.sys.user;
-            document.getElementById('uptime').innerText = d.sys.uptime;
-            
-            // Network Info
-            document.getElementById('net-iface').innerText = d.sys.net_info.interface;
-            document.getElementById('net-ip').innerText = d.sys.net_info.ip;
-            
-            // Speeds
-            document.getElementById('down').innerText = d.net_speed.down;
-            document.getElementById('up').innerText = d.net_speed.up;
-            document.getElementById('load-avg').innerText = d.sys.load.join(', ');
-
-            // Charts
-            const updateChart = (name, val, detailId, detailText) => {
-                charts[name].data.datasets[0].data = [val, 100 - val];
-                charts[name].update();
-                document.getElementById(`${name}-text`).innerText = val + '%';
-                if(detailId) document.getElementById(detailId).innerText = detailText;
-            };
-
-            updateChart('cpu', d.usage.cpu);
-            updateChart('mem', d.usage.mem.percent, 'mem-detail', `${d.usage.mem.used} / ${d.usage.mem.total}`);
-            updateChart('disk', d.usage.disk.percent, 'disk-detail', `${d.usage.disk.used} / ${d.usage.disk.total}`);
-
-            // Tables
-            document.querySelector('#proc-table tbody').innerHTML = d.procs.map(p => 
-                `<tr><td>${p.pid}</td><td>${p.name}</td><td><span class="badge">${p.cpu_percent}%</span></td></tr>`
-            ).join('');
-
-            document.querySelector('#port-table tbody').innerHTML = d.ports.map(p => 
-                `<tr><td><span class="badge" style="color:var(--accent)">${p.p}</span></td><td>${p.n}</td></tr>`
-            ).join('');
-
-            // Logs
-            document.getElementById('log-container').innerHTML = d.logs.map(line => 
-                `<div class="log-line">${line}</div>`
-            ).join('');
-
-        } catch (e) { console.error("Update failed", e); }
-    }
-
-    setInterval(update, 2000);
-    update();
-</script>
-</body>
-</html>
+            "collectors": collectors,
+        }
+
+    async def start(self):
+        self.process.cpu_percent(None)  # baseline for the first perf report
+        if self.replayer:
+            self.task = asyncio.create_task(self.replayer.run(self))
+            return
+        # One worker per collector: a hung collector is never restarted, so it can hold at most one.
+        self.pool = ThreadPoolExecutor(max_workers=len(self.collectors), thread_name_prefix="collector")
+        try:
+            self.archive = Archive()
+        except OSError as e:
+            print(f"[sampler] archive disabled: {e}")
+        if self.alerts is None:
+            try:
+                self.alerts = AlertEngine(load_alerts())
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"[sampler] alerts disabled: {e}")
+        if self.alerts and self.alerts.needs("new_port"):
+            self.collectors["ports"].always = True  # a new listener must show up without a viewer
+        self.journal.start()
+        self.want()
+        await self.tick()
+        # want() woke the idle sampler for the tick above; left set, run() would tick again
+        # right away and compute the first rates over a few milliseconds.
+        self.wake.clear()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.archive:
+            self.archive.close()
+        if self.recorder:
+            self.recorder.close()
+        if self.alerts:
+            self.alerts.close()
+        self.filesystems.close()
+        await self.journal.stop()
+
+
+SAMPLER = Sampler()
+
+# Set from the command line: agents serve the API only, a hub also polls other agents.
+AGENT_MODE = False
+HUB = None
+
+@app.on_event("startup")
+async def startup_event():
+    await SAMPLER.start()
+    if HUB:
+        HUB.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await SAMPLER.stop()
+    if HUB:
+        await HUB.stop()
+
+MEDIA_TYPES = {"json": "application/json", "compact": "application/json", "msgpack": "application/msgpack"}
+
+def encoded_response(request, body, build, media_type):
+    """Sends body, or build(encoding) when the client accepts compression and it is worth it."""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding and len(body) >= MIN_COMPRESS:
+        body = build(encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@app.get("/api/stats")
+async def stats(request: Request, fields: str = "",
+                fmt: str = Query("json", alias="format", pattern="^(json|compact|msgpack)$")):
+    """Latest snapshot; fields=usage,net_speed limits both the response and what gets sampled.
+
+    format=compact (or msgpack) sends raw numbers and leaves formatting to the client.
     """
+    # Served straight from the last published snapshot; no collector runs per request.
+    if fmt == "msgpack" and msgpack is None:
+        raise HTTPException(status_code=406, detail="MessagePack support is not installed (pip install msgpack)")
+    wanted = tuple(sorted(set(f.strip() for f in fields.split(",") if f.strip())))
+    unknown = [f for f in wanted if f not in SAMPLER.sections]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if SAMPLER.want(wanted or None):
+        await SAMPLER.fresh()
+    return encoded_response(request, SAMPLER.encoded(wanted, fmt),
+                            lambda encoding: SAMPLER.encoded(wanted, fmt, encoding), MEDIA_TYPES[fmt])
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """OpenMetrics exposition, prebuilt once per tick from the collectors' raw values."""
+    if SAMPLER.want():
+        await SAMPLER.fresh()
+    return encoded_response(request, SAMPLER.metrics_body, SAMPLER.encoded_metrics, OPENMETRICS_TYPE)
+
+@app.get("/api/debug/perf")
+async def debug_perf():
+    """Self-instrumentation: per-collector p50/p95/p99, serialization time, own CPU and RSS."""
+    return SAMPLER.perf_report()
+
+@app.get("/api/fleet")
+async def fleet(top: int = Query(10, ge=1, le=100)):
+    """Hub mode only: every agent's latest summary plus the top hosts by cpu, mem and disk."""
+    if not HUB:
+        raise HTTPException(status_code=404, detail="Not running in hub mode")
+    return HUB.fleet(top)
+
+@app.get("/api/units")
+async def units(sort: str = Query("cpu", pattern="^(cpu|mem|io|pids)$"), n: int = Query(50, ge=1, le=1000)):
+    """Top n systemd units / containers by cgroup v2 usage."""
+    if SAMPLER.cgroups.root is None:
+        raise HTTPException(status_code=503, detail="cgroup v2 is not available")
+    SAMPLER.want(("units",))
+    return get_top_units(SAMPLER.cgroups, sort, n)
+
+@app.get("/api/ports")
+async def ports():
+    """Every listening TCP/UDP socket with its address and owning process."""
+    if SAMPLER.want(("ports",)):
+        await SAMPLER.fresh()
+    return SAMPLER.ports.listeners
+
+@app.get("/api/logs")
+async def logs(after: int = 0, unit: str = "", priority: str = "", limit: int = Query(200, ge=1, le=1000)):
+    """Journal entries newer than cursor `after`; priority takes a name (err) or number (3)."""
+    level = None
+    if priority:
+        level = PRIORITIES.index(priority) if priority in PRIORITIES else int(priority) if priority.isdigit() else None
+        if level is None:
+            raise HTTPException(status_code=400, detail=f"Unknown priority: {priority}")
+    return SAMPLER.journal.read(after, unit or None, level, limit)
+
+@app.get("/api/alerts")
+async def alerts():
+    """Firing alerts, recent firing/resolved transitions and the configured rules."""
+    if SAMPLER.alerts is None:
+        raise HTTPException(status_code=503, detail="alerting is disabled")
+    return SAMPLER.alerts.report()
+
+@app.get("/api/history")
+async def history(metric: str = "", start: float = Query(-600, alias="from"),
+                  end: float = Query(0, alias="to"), step: float = 0):
+    """Min/avg/max points for one metric; from/to <= 0 are seconds relative to now."""
+    if not metric:
+        return {"metrics": SAMPLER.history.names()}
+    now = time.time()
+    start = now + start if start <= 0 else start
+    end = now + end if end <= 0 else end
+    result = SAMPLER.history.query(metric, start, end, step)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown metric: {metric}")
+    return result
+
+@app.get("/api/archive")
+async def archive(start: float = Query(-3600, alias="from"), end: float = Query(0, alias="to")):
+    """Archived samples that survive restarts; from/to <= 0 are seconds relative to now."""
+    if not SAMPLER.archive:
+        raise HTTPException(status_code=503, detail="Archive is not available")
+    now = time.time()
+    start = now + start if start <= 0 else start
+    end = now + end if end <= 0 else end
+    fields, rows = SAMPLER.archive.query(start, end)
+    return {"fields": ["ts", *fields], "records": rows}
+
+@app.get("/api/stream")
+async def stream():
+    """Server-Sent Events: one full snapshot on connect, then per-tick deltas."""
+    async def events():
+        version = SAMPLER.version
+        SAMPLER.subscribe()
+        try:
+            yield b"event: full\ndata: " + SAMPLER.body + b"\n\n"
+            while True:
+                if SAMPLER.version == version:
+                    try:
+                        await asyncio.wait_for(SAMPLER.changed.wait(), STREAM_KEEPALIVE)
+                    except asyncio.TimeoutError:
+                        yield b": keepalive\n\n"
+                        continue
+                if SAMPLER.version == version + 1:
+                    yield b"event: delta\ndata: " + SAMPLER.delta_body + b"\n\n"
+                else:
+                    # Missed a tick (slow client): resync with the full snapshot.
+                    yield b"event: full\ndata: " + SAMPLER.body + b"\n\n"
+                version = SAMPLER.version
+        finally:
+            SAMPLER.unsubscribe()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+BUNDLE = Bundle()
+
+@app.get("/", response_class=HTMLResponse)
+def ui(request: Request):
+    if AGENT_MODE:
+        raise HTTPException(status_code=404, detail="Headless agent: use /api/stats")
+    # Rendered from templates/index.html and precompressed once at start-up;
+    # "no-cache" makes browsers revalidate, which costs a 304.
+    encoding, body, etag = BUNDLE.index.variant(request.headers.get("accept-encoding"))
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if BUNDLE.index.matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
+
+@app.get("/static/{version}/{name}")
+def static(request: Request, version: str, name: str):
+    """Versioned bundle assets; the URL changes with the content, so they are cached forever."""
+    found = BUNDLE.get(version, name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Unknown asset")
+    asset, media_type = found
+    encoding, body, etag = asset.variant(request.headers.get("accept-encoding"))
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+    if asset.matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
-    # Important: journalctl and net_connections require sudo/root for full output
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="System Pulse dashboard")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--agent", action="store_true", help="headless: serve the API without the UI")
+    parser.add_argument("--hub", metavar="HOST:PORT,...", help="also poll these agents and serve /api/fleet")
+    parser.add_argument("--record", metavar="FILE", help="append every snapshot to a compressed capture file")
+    parser.add_argument("--replay", metavar="FILE", help="serve a capture file instead of sampling this host")
+    parser.add_argument("--alerts", metavar="FILE", help="alert rules (JSON; default ~/.pingsdashboard/alerts.json)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier (default 1)")
+    args = parser.parse_args()
+    AGENT_MODE = args.agent
+    if args.record:
+        SAMPLER.recorder = Recorder(args.record)
+    if args.replay:
+        SAMPLER.replayer = Replayer(args.replay, args.speed)
+    if args.alerts:
+        try:
+            SAMPLER.alerts = AlertEngine(load_alerts(args.alerts))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            parser.error(f"--alerts: {e}")
+    if args.hub:
+        HUB = Hub([a.strip() for a in args.hub.split(",") if a.strip()])
+    # Important: journalctl and /proc/*/fd (listening port owners) require sudo/root for full output
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,78 @@
+"""
+openmetrics.py
+OpenMetrics text exposition for the sampler's raw collector values.
+
+Collectors hand over (family, labels, value) samples; render() turns them
+into one text buffer, which the sampler builds once per tick so /metrics
+only ever returns prebuilt bytes.
+"""
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# family -> (type, help). Counter samples get the _total suffix when rendered.
+FAMILIES = {
+    "pulse_host": ("info", "Host identity."),
+    "pulse_boot_time_seconds": ("gauge", "Unix time the host booted."),
+    "pulse_load1": ("gauge", "1-minute load average."),
+    "pulse_load5": ("gauge", "5-minute load average."),
+    "pulse_load15": ("gauge", "15-minute load average."),
+    "pulse_cpu_usage_percent": ("gauge", "CPU utilisation over the last sample interval."),
+    "pulse_cpu_busy_seconds": ("counter", "Non-idle CPU time per cpu."),
+    "pulse_cpu_seconds": ("counter", "Total CPU time per cpu."),
+    "pulse_memory_total_bytes": ("gauge", "Physical memory."),
+    "pulse_memory_used_bytes": ("gauge", "Used physical memory."),
+    "pulse_memory_available_bytes": ("gauge", "Memory available without swapping."),
+    "pulse_filesystem_size_bytes": ("gauge", "Filesystem size."),
+    "pulse_filesystem_used_bytes": ("gauge", "Filesystem space in use."),
+    "pulse_filesystem_free_bytes": ("gauge", "Filesystem space available to unprivileged users."),
+    "pulse_filesystem_files": ("gauge", "Filesystem inodes."),
+    "pulse_filesystem_files_free": ("gauge", "Filesystem inodes free."),
+    "pulse_network_receive_bytes": ("counter", "Bytes received per interface."),
+    "pulse_network_transmit_bytes": ("counter", "Bytes sent per interface."),
+    "pulse_network_errors": ("counter", "Receive and transmit errors per interface."),
+    "pulse_network_drops": ("counter", "Receive and transmit drops per interface."),
+    "pulse_disk_reads_completed": ("counter", "Reads completed per block device."),
+    "pulse_disk_writes_completed": ("counter", "Writes completed per block device."),
+    "pulse_disk_read_bytes": ("counter", "Bytes read per block device."),
+    "pulse_disk_written_bytes": ("counter", "Bytes written per block device."),
+    "pulse_disk_io_time_seconds": ("counter", "Time spent doing I/O per block device."),
+    "pulse_processes": ("gauge", "Number of processes."),
+    "pulse_process_cpu_seconds": ("counter", "CPU time of the top processes."),
+    "pulse_process_cpu_percent": ("gauge", "CPU utilisation of the top processes."),
+    "pulse_process_resident_bytes": ("gauge", "Resident memory of the top processes."),
+    "pulse_process_threads": ("gauge", "Thread count of the top processes."),
+    "pulse_units": ("gauge", "Number of systemd units and containers with a cgroup."),
+    "pulse_unit_cpu_seconds": ("counter", "CPU time per unit (cgroup v2 cpu.stat)."),
+    "pulse_unit_memory_bytes": ("gauge", "Memory charged to each unit (memory.current)."),
+    "pulse_unit_read_bytes": ("counter", "Bytes read per unit (io.stat)."),
+    "pulse_unit_written_bytes": ("counter", "Bytes written per unit (io.stat)."),
+    "pulse_unit_pids": ("gauge", "Tasks per unit (pids.current)."),
+    "pulse_listening_sockets": ("gauge", "Number of listening TCP/UDP sockets."),
+    "pulse_listener_sockets": ("gauge", "Listening sockets per protocol, address, port and process name."),
+    "pulse_journal_entries": ("counter", "Journal entries read since start."),
+}
+
+SUFFIX = {"counter": "_total", "info": "_info"}
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render(samples):
+    """samples: iterable of (family, labels dict, value). Returns the exposition as bytes."""
+    grouped = {}
+    for family, labels, value in samples:
+        grouped.setdefault(family, []).append((labels, value))
+    lines = []
+    for family, rows in grouped.items():
+        kind, help_text = FAMILIES.get(family, ("unknown", ""))
+        lines.append(f"# TYPE {family} {kind}")
+        if help_text:
+            lines.append(f"# HELP {family} {help_text}")
+        name = family + SUFFIX.get(kind, "")
+        for labels, value in rows:
+            label_text = ",".join(f'{k}="{escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    lines.append("# EOF")
+    return ("\n".join(lines) + "\n").encode()
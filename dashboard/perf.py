@@ -0,0 +1,73 @@
+"""
+perf.py
+Cheap latency histograms for the dashboard's own hot paths.
+
+Durations land in fixed log-scaled buckets (four per power of two, 10 us to
+~2 min), so recording is a log2 and a list increment and percentiles are read
+from the cumulative counts without keeping any samples.
+"""
+
+import math
+import time
+
+BASE = 1e-5          # lower edge of the first bucket, seconds
+PER_OCTAVE = 4
+BUCKETS = 96
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "errors")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def record(self, seconds):
+        i = int(math.log2(seconds / BASE) * PER_OCTAVE) + 1 if seconds > BASE else 0
+        self.counts[min(i, BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile, in seconds."""
+        if not self.count:
+            return None
+        rank, seen = q / 100 * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BASE * 2 ** (i / PER_OCTAVE), self.max)
+        return self.max
+
+    def summary(self):
+        ms = lambda s: round(s * 1000, 3) if s is not None else None
+        return {
+            "calls": self.count,
+            "errors": self.errors,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+            "max_ms": ms(self.max),
+        }
+
+
+class timed:
+    """Context manager recording the block's duration into a histogram."""
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, kind, value, tb):
+        self.hist.record(time.perf_counter() - self.start)
+        if kind is not None:
+            self.hist.errors += 1
@@ -0,0 +1,124 @@
+"""
+ports.py
+Listening socket index built from /proc/net/{tcp,tcp6,udp,udp6}.
+
+The socket tables say which inodes are listening; finding the owning process
+means walking /proc/[pid]/fd, which is the expensive part. That walk only
+happens when an unknown listener inode shows up, and stops as soon as every
+unknown inode is found, so the steady-state cost is one read of the tables.
+"""
+
+import os
+import time
+import socket
+
+PROC = "/proc"
+TABLES = {"tcp": socket.AF_INET, "tcp6": socket.AF_INET6, "udp": socket.AF_INET, "udp6": socket.AF_INET6}
+TCP_LISTEN = b"0A"
+UDP_UNCONN = b"07"
+RESCAN_UNRESOLVED = 30.0  # seconds before retrying inodes no process could be found for
+
+
+def decode_addr(hex_addr, family):
+    raw = bytes.fromhex(hex_addr.decode())
+    if family == socket.AF_INET:
+        raw = raw[::-1]
+    else:
+        # Four host-endian 32-bit words.
+        raw = b"".join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+    return socket.inet_ntop(family, raw)
+
+
+class PortIndex:
+    """Tracks listening sockets and the process owning each of them."""
+
+    def __init__(self, proc=PROC):
+        self.proc = proc
+        self.owners = {}      # inode -> (pid, name)
+        self.names = {}       # pid -> (start time, name)
+        self.unresolved = {}  # inode -> monotonic time of the failed lookup
+        self.listeners = []
+
+    def read_tables(self):
+        found = []
+        for proto, family in TABLES.items():
+            state = TCP_LISTEN if proto.startswith("tcp") else UDP_UNCONN
+            try:
+                with open(f"{self.proc}/net/{proto}", "rb") as f:
+                    next(f, None)  # header
+                    for line in f:
+                        parts = line.split(None, 10)
+                        if len(parts) < 10 or parts[3] != state:
+                            continue
+                        addr, port = parts[1].split(b":")
+                        found.append((proto, decode_addr(addr, family), int(port, 16), int(parts[9])))
+            except OSError:
+                continue
+        return found
+
+    def process_name(self, pid):
+        try:
+            with open(f"{self.proc}/{pid}/stat", "rb") as f:
+                data = f.read()
+        except OSError:
+            return "?"
+        rparen = data.rfind(b")")
+        start = data[rparen + 2:].split()[19]
+        cached = self.names.get(pid)
+        if cached and cached[0] == start:
+            return cached[1]
+        name = data[data.find(b"(") + 1:rparen].decode(errors="replace")
+        self.names[pid] = (start, name)
+        return name
+
+    def scan_fds(self, wanted):
+        """Walks /proc/*/fd until every inode in wanted has an owner."""
+        for entry in os.listdir(self.proc):
+            if not wanted:
+                break
+            if not entry.isdigit():
+                continue
+            fd_dir = f"{self.proc}/{entry}/fd"
+            try:
+                fds = os.listdir(fd_dir)
+            except OSError:
+                continue
+            for fd in fds:
+                try:
+                    link = os.readlink(f"{fd_dir}/{fd}")
+                except OSError:
+                    continue
+                if link.startswith("socket:["):
+                    inode = int(link[8:-1])
+                    if inode in wanted:
+                        pid = int(entry)
+                        self.owners[inode] = (pid, self.process_name(pid))
+                        wanted.discard(inode)
+
+    def update(self):
+        found = self.read_tables()
+        live = {inode for *_, inode in found}
+        now = time.monotonic()
+        wanted = {inode for inode in live - self.owners.keys()
+                  if inode and now - self.unresolved.get(inode, -RESCAN_UNRESOLVED) >= RESCAN_UNRESOLVED}
+        if wanted:
+            self.scan_fds(wanted)
+            for inode in wanted:
+                self.unresolved[inode] = now
+
+        # Forget sockets that have been closed.
+        for inode in self.owners.keys() - live:
+            del self.owners[inode]
+        for inode in self.unresolved.keys() - live:
+            del self.unresolved[inode]
+        live_pids = {pid for pid, _ in self.owners.values()}
+        for pid in self.names.keys() - live_pids:
+            del self.names[pid]
+
+        listeners = []
+        for proto, addr, port, inode in found:
+            pid, name = self.owners.get(inode, (None, "?"))
+            listeners.append({"proto": proto, "addr": addr, "port": port, "pid": pid, "name": name})
+        listeners.sort(key=lambda l: (l["port"], l["proto"]))
+        self.listeners = listeners
+        return listeners
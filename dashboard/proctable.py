@@ -0,0 +1,112 @@
+"""
+proctable.py
+Persistent process table fed straight from /proc/[pid]/stat.
+
+Entries are keyed by pid and checked against the process start time, so a
+reused pid is treated as a new process. Names are only read when a process
+first shows up and CPU/I/O rates are deltas against the previous update,
+which gives every process a real baseline from its second sample on.
+"""
+
+import os
+import time
+import heapq
+
+PROC = "/proc"
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Offsets into the fields that follow the ")" closing the comm in /proc/[pid]/stat.
+UTIME, STIME, NUM_THREADS, STARTTIME, RSS = 11, 12, 17, 19, 21
+
+
+class ProcEntry:
+    __slots__ = ("pid", "start", "name", "ticks", "cpu_percent", "rss", "threads",
+                 "io_bytes", "io_at", "io_rate", "io_ok")
+
+    def __init__(self, pid, start, name, ticks):
+        self.pid = pid
+        self.start = start
+        self.name = name
+        self.ticks = ticks
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.threads = 0
+        self.io_bytes = None
+        self.io_at = None  # monotonic time io_bytes was read
+        self.io_rate = 0.0
+        self.io_ok = True  # cleared once /proc/[pid]/io turns out to be unreadable
+
+
+class ProcTable:
+    """Keeps one ProcEntry per live process and refreshes it on update()."""
+
+    def __init__(self, proc=PROC):
+        self.proc = proc
+        self.entries = {}
+        self.updated = None
+        self.update()
+
+    def read_io(self, entry):
+        try:
+            with open(f"{self.proc}/{entry.pid}/io", "rb") as f:
+                total = 0
+                for line in f:
+                    if line.startswith((b"read_bytes", b"write_bytes")):
+                        total += int(line.split()[1])
+                return total
+        except PermissionError:
+            entry.io_ok = False
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def update(self):
+        now = time.monotonic()
+        elapsed = (now - self.updated) if self.updated else 0.0
+        self.updated = now
+        entries = {}
+        for name in os.listdir(self.proc):
+            if not name.isdigit():
+                continue
+            pid = int(name)
+            try:
+                with open(f"{self.proc}/{pid}/stat", "rb") as f:
+                    data = f.read()
+                rparen = data.rfind(b")")
+                fields = data[rparen + 2:].split()
+                start = int(fields[STARTTIME])
+                ticks = int(fields[UTIME]) + int(fields[STIME])
+            except (OSError, ValueError, IndexError):
+                continue  # exited between listdir and open
+
+            entry = self.entries.get(pid)
+            busy = True
+            if entry is None or entry.start != start:
+                comm = data[data.find(b"(") + 1:rparen].decode(errors="replace")
+                entry = ProcEntry(pid, start, comm, ticks)
+            else:
+                busy = ticks != entry.ticks
+                entry.cpu_percent = round((ticks - entry.ticks) / CLK_TCK / elapsed * 100, 1) if elapsed else 0.0
+                entry.ticks = ticks
+            entry.rss = int(fields[RSS]) * PAGE_SIZE
+            entry.threads = int(fields[NUM_THREADS])
+
+            # A process that burnt no CPU since the last update issued no I/O syscalls either,
+            # so /proc/[pid]/io is only re-read for the busy ones.
+            if entry.io_ok and busy:
+                io_bytes = self.read_io(entry)
+                if io_bytes is not None:
+                    # Idle updates skip the read, so the delta may span several of them.
+                    if entry.io_bytes is not None and now > entry.io_at:
+                        entry.io_rate = (io_bytes - entry.io_bytes) / (now - entry.io_at)
+                    entry.io_bytes, entry.io_at = io_bytes, now
+            elif not busy:
+                entry.io_rate = 0.0
+            entries[pid] = entry
+        self.entries = entries
+
+    def top(self, key, n=10):
+        """Top n entries by one of: cpu, mem, io, threads (bounded heap, no full sort)."""
+        attr = {"cpu": "cpu_percent", "mem": "rss", "io": "io_rate", "threads": "threads"}[key]
+        return heapq.nlargest(n, self.entries.values(), key=lambda e: getattr(e, attr))
@@ -0,0 +1,149 @@
+"""
+recording.py
+Record the sampler's snapshots to a compressed capture file and replay them.
+
+A capture is a gzip file of JSON lines, one per tick:
+{"t": unix time, "full": snapshot, "m": metrics} every KEYFRAME_EVERY ticks
+and {"t": ..., "d": delta, "m": metrics} in between, where the delta is the
+same one /api/stream sends. Each line is sync-flushed, so the file is
+readable up to the last tick even after a crash, and every restart appends a
+new gzip member that begins with a keyframe (a member cut off by a crash is
+closed properly first, so the members after it stay readable).
+"""
+
+import os
+import gzip
+import json
+import time
+import zlib
+import asyncio
+
+KEYFRAME_EVERY = 300  # ticks between full snapshots
+REPLAY_MAX_GAP = 10.0  # recorded seconds; longer gaps (dashboard was down) are skipped
+
+
+def patch(target, delta):
+    """Applies a diff() delta in place; None removes a key."""
+    for key, value in delta.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            patch(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def chunks(path):
+    """Yields decompressed data across gzip members; returns True if the last member is complete.
+
+    Unlike gzip.open this also returns what was sync-flushed before a crash.
+    """
+    d, fresh = zlib.decompressobj(16 + zlib.MAX_WBITS), True
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(1 << 16), b""):
+            while data:
+                fresh = False
+                try:
+                    out = d.decompress(data)
+                except zlib.error:
+                    return False
+                if out:
+                    yield out
+                data = b""
+                if d.eof:
+                    data = d.unused_data
+                    d, fresh = zlib.decompressobj(16 + zlib.MAX_WBITS), True
+    return fresh
+
+
+def lines(path):
+    """Yields the complete lines of a capture, stopping quietly where it was cut off."""
+    pending = b""
+    for data in chunks(path):
+        pending += data
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            yield line + b"\n"
+
+
+def is_torn(path):
+    reader = chunks(path)
+    while True:
+        try:
+            next(reader)
+        except StopIteration as done:
+            return not done.value
+
+
+def repair(path):
+    """Rewrites a capture whose last gzip member has no trailer, keeping every complete line."""
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wb") as out:
+        for line in lines(path):
+            out.write(line)
+    os.replace(tmp, path)
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path) and is_torn(path):
+            repair(path)
+        self.file = gzip.open(path, "ab", compresslevel=6)
+        self.since_keyframe = None  # None until the first keyframe of this member
+
+    def write(self, ts, body, delta_body, metrics):
+        if self.since_keyframe is None or self.since_keyframe >= KEYFRAME_EVERY:
+            line = b'{"t": %.3f, "full": %s' % (ts, body)
+            self.since_keyframe = 0
+        else:
+            line = b'{"t": %.3f, "d": %s' % (ts, delta_body)
+        self.since_keyframe += 1
+        self.file.write(line + b', "m": ' + json.dumps(metrics).encode() + b'}\n')
+        self.file.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self):
+        self.file.close()
+
+
+def read_records(path):
+    """Yields (ts, snapshot, metrics); snapshots are rebuilt from keyframes and deltas."""
+    snapshot = None
+    for line in lines(path):
+        rec = json.loads(line)
+        if "full" in rec:
+            snapshot = rec["full"]
+        elif snapshot is None:
+            continue  # delta without a keyframe to apply it to
+        else:
+            # Copy first: the sampler diffs the next snapshot against this one.
+            snapshot = patch(json.loads(json.dumps(snapshot)), rec["d"])
+        yield rec["t"], snapshot, rec.get("m", {})
+
+
+class Replayer:
+    """Feeds a recording into the sampler at the recorded pace, divided by speed."""
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.position = None  # recorded time of the snapshot being served
+        self.done = False
+
+    async def run(self, sampler):
+        first = started = prev = None
+        for ts, snapshot, metrics in read_records(self.path):
+            if first is None:
+                first, started = ts, time.monotonic()
+            elif ts - prev > REPLAY_MAX_GAP:
+                first += ts - prev - REPLAY_MAX_GAP
+            prev = ts
+            delay = started + (ts - first) / self.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.position = ts
+            sampler.publish(snapshot)
+            sampler.history.record(ts, metrics)
+        self.done = True
+        print(f"[replay] end of {self.path}; serving the last snapshot")
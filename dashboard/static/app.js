@@ -0,0 +1,229 @@
+// Usage rings: an SVG circle whose dash length is the percentage (pathLength="100").
+const charts = {
+    cpu: document.getElementById('cpuChart'),
+    mem: document.getElementById('memChart'),
+    disk: document.getElementById('diskChart')
+};
+
+function render(d) {
+    try {
+        // Header & Quick Stats
+        document.getElementById('os-info').innerText = `${d.sys.os} | ${d.sys.hostname}`;
+        document.getElementById('username').innerText = d.sys.user;
+        document.getElementById('uptime').innerText = d.sys.uptime;
+        
+        // Network Info
+        document.getElementById('net-iface').innerText = d.sys.net_info.interface;
+        document.getElementById('net-ip').innerText = d.sys.net_info.ip;
+        
+        // Speeds
+        document.getElementById('down').innerText = d.net_speed.down;
+        document.getElementById('up').innerText = d.net_speed.up;
+        document.getElementById('load-avg').innerText = d.sys.load.join(', ');
+
+        // Charts
+        const updateChart = (name, val, detailId, detailText) => {
+            charts[name].style.strokeDasharray = `${val} ${100 - val}`;
+            document.getElementById(`${name}-text`).innerText = val + '%';
+            if(detailId) document.getElementById(detailId).innerText = detailText;
+        };
+
+        updateChart('cpu', d.usage.cpu);
+        updateChart('mem', d.usage.mem.percent, 'mem-detail', `${d.usage.mem.used} / ${d.usage.mem.total}`);
+        updateChart('disk', d.usage.disk.percent, 'disk-detail', `${d.usage.disk.used} / ${d.usage.disk.total}`);
+
+        // Per-device cards
+        if (d.cores) {
+            document.getElementById('core-count').innerText = `${d.cores.length} cores`;
+            document.getElementById('core-map').innerHTML = d.cores.map((v, i) =>
+                `<div class="heat-cell" title="cpu${i}: ${v}%" style="background:hsl(${220 - v * 2.2}, 80%, ${20 + v * 0.35}%)"></div>`
+            ).join('');
+        }
+        if (d.nics) {
+            document.querySelector('#nic-table tbody').innerHTML = d.nics.map(n =>
+                `<tr><td>${esc(n.name)}</td><td>${esc(n.rx)}</td><td>${esc(n.tx)}</td><td>${n.errs + n.drops}</td>` +
+                `<td><canvas class="spark" id="spark-nic-${esc(n.name)}"></canvas></td></tr>`
+            ).join('');
+            d.nics.forEach(n => sparkline(`nic-${n.name}`, n.rx_rate + n.tx_rate, '#3b82f6'));
+        }
+        if (d.blockdev) {
+            document.querySelector('#blk-table tbody').innerHTML = d.blockdev.map(b =>
+                `<tr><td>${esc(b.name)}</td><td>${esc(b.read)}</td><td>${esc(b.write)}</td><td>${b.r_iops} / ${b.w_iops}</td>` +
+                `<td><span class="badge">${b.util}%</span></td><td><canvas class="spark" id="spark-blk-${esc(b.name)}"></canvas></td></tr>`
+            ).join('');
+            d.blockdev.forEach(b => sparkline(`blk-${b.name}`, b.r_bps + b.w_bps, '#10b981'));
+        }
+        if (d.filesystems) {
+            document.querySelector('#fs-table tbody').innerHTML = d.filesystems.map(f =>
+                `<tr><td>${esc(f.mount)}${f.hung ? ' <span class="badge" style="color:#f59e0b">not responding</span>' : ''}</td>` +
+                `<td>${esc(f.fstype)}</td><td>${esc(f.used ?? '--')}</td><td>${esc(f.size ?? '--')}</td>` +
+                `<td><span class="badge">${f.percent ?? '--'}%</span></td><td>${f.inodes ? f.inodes_percent + '%' : '--'}</td></tr>`
+            ).join('');
+        }
+
+        // Tables
+        const sort = document.getElementById('proc-sort').value;
+        const procCols = {cpu: ['CPU%', p => p.cpu_percent + '%'], mem: ['Memory', p => p.mem],
+                          io: ['Disk I/O', p => p.io], threads: ['Threads', p => p.threads]};
+        const [procTitle, procVal] = procCols[sort];
+        document.getElementById('proc-col').innerText = procTitle;
+        document.querySelector('#proc-table tbody').innerHTML = (sort === 'cpu' ? d.procs : d.procs_by[sort]).map(p => 
+            `<tr><td>${p.pid}</td><td>${esc(p.name)}</td><td><span class="badge">${esc(procVal(p))}</span></td></tr>`
+        ).join('');
+
+        if (d.units && d.units.length) {
+            const unitSort = document.getElementById('unit-sort').value;
+            document.getElementById('unit-card').style.display = '';
+            document.querySelector('#unit-table tbody').innerHTML = (unitSort === 'cpu' ? d.units : d.units_by[unitSort]).map(u =>
+                `<tr><td title="${esc(u.path)}">${esc(u.name)}</td><td>${u.cpu_percent}%</td><td>${esc(u.mem)}</td>` +
+                `<td>${esc(u.io)}</td><td>${u.pids}</td></tr>`
+            ).join('');
+        }
+
+        document.querySelector('#port-table tbody').innerHTML = d.ports.map(p => 
+            `<tr><td><span class="badge" style="color:var(--accent)">${p.p}</span></td><td>${esc(p.n)}</td></tr>`
+        ).join('');
+
+        const alerts = d.alerts || [];
+        document.getElementById('alert-card').style.display = alerts.length ? '' : 'none';
+        document.getElementById('alert-summary').innerText = `${alerts.length} firing`;
+        document.querySelector('#alert-table tbody').innerHTML = alerts.map(a =>
+            `<tr><td>${esc(a.rule)}</td><td>${new Date(a.since * 1000).toLocaleTimeString()}</td>` +
+            `<td><span class="badge" style="color:#ef4444">${esc(a.value ?? '--')}</span></td><td>${esc(a.message)}</td></tr>`
+        ).join('');
+
+        // Logs
+        if (d.log_cursor !== seenLogCursor) {
+            seenLogCursor = d.log_cursor;
+            fetchLogs(false);
+        }
+
+    } catch (e) { console.error("Update failed", e); }
+}
+
+// Deltas only carry changed fields; null marks a removed key, lists are replaced whole.
+function merge(target, delta) {
+    for (const [k, v] of Object.entries(delta)) {
+        if (v === null) delete target[k];
+        else if (typeof v === 'object' && !Array.isArray(v) && typeof target[k] === 'object' && !Array.isArray(target[k])) merge(target[k], v);
+        else target[k] = v;
+    }
+}
+
+let state = {};
+
+// Client-side sparklines: the last SPARK_POINTS values per series, redrawn on each tick.
+const SPARK_POINTS = 60;
+const sparks = {};
+function sparkline(key, value, color) {
+    const values = sparks[key] = (sparks[key] || []).concat([value]).slice(-SPARK_POINTS);
+    const canvas = document.getElementById(`spark-${key}`);
+    if (!canvas) return;
+    const ctx = canvas.getContext('2d');
+    const w = canvas.width = canvas.clientWidth, h = canvas.height = canvas.clientHeight;
+    const max = Math.max(...values, 1);
+    ctx.strokeStyle = color;
+    ctx.beginPath();
+    values.forEach((v, i) => {
+        const x = (i / (SPARK_POINTS - 1)) * w, y = h - (v / max) * (h - 2) - 1;
+        i ? ctx.lineTo(x, y) : ctx.moveTo(x, y);
+    });
+    ctx.stroke();
+}
+
+// Logs are read incrementally from /api/logs whenever the journal cursor in the snapshot moves.
+const LOG_LINES = 500;
+// Everything interpolated into innerHTML goes through esc(), attribute values included.
+const esc = s => String(s).replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+let logCursor = 0, seenLogCursor = null, logLines = [], logBusy = false;
+
+async function fetchLogs(reset) {
+    if (logBusy) return;
+    logBusy = true;
+    try {
+        if (reset) { logCursor = 0; logLines = []; }
+        const unit = encodeURIComponent(document.getElementById('log-unit').value.trim());
+        const prio = document.getElementById('log-prio').value;
+        const res = await fetch(`/api/logs?after=${logCursor}&unit=${unit}&priority=${prio}&limit=${LOG_LINES}`);
+        const r = await res.json();
+        if (r.dropped) logLines = [];
+        logCursor = r.cursor;
+        logLines = logLines.concat(r.entries.map(e => e.line)).slice(-LOG_LINES);
+        const box = document.getElementById('log-container');
+        const atBottom = box.scrollTop + box.clientHeight >= box.scrollHeight - 4;
+        box.innerHTML = logLines.length
+            ? logLines.map(line => `<div class="log-line">${esc(line)}</div>`).join('')
+            : esc(r.error || 'No matching log entries.');
+        if (atBottom || reset) box.scrollTop = box.scrollHeight;
+    } catch (e) { console.error("Log update failed", e); }
+    finally { logBusy = false; }
+}
+
+async function poll() {
+    try {
+        const res = await fetch('/api/stats');
+        state = await res.json();
+        render(state);
+    } catch (e) { console.error("Update failed", e); }
+}
+
+// Fleet card: only a hub answers /api/fleet, so the card stays hidden elsewhere.
+async function pollFleet() {
+    try {
+        const res = await fetch('/api/fleet?top=10');
+        if (!res.ok) return;
+        const f = await res.json();
+        document.getElementById('fleet-card').style.display = '';
+        document.getElementById('fleet-summary').innerText = `${f.reachable}/${f.agents} reachable`;
+        const down = f.hosts.filter(h => h.error);
+        document.querySelector('#fleet-table tbody').innerHTML = f.top.cpu.concat(down).map(h =>
+            `<tr><td>${esc(h.hostname || h.agent)}</td><td>${esc(h.cpu ?? '--')}</td><td>${esc(h.mem ?? '--')}</td>` +
+            `<td>${esc(h.disk ?? '--')}</td><td>${h.load ? h.load.map(v => v.toFixed(2)).join(', ') : '--'}</td>` +
+            `<td><span class="badge">${esc(h.error || h.age + 's ago')}</span></td></tr>`
+        ).join('');
+    } catch (e) { console.error("Fleet update failed", e); }
+    if (!document.hidden) fleetTimer = setTimeout(pollFleet, 5000);
+}
+let fleetTimer = null;
+
+const SHOW_PERF = new URLSearchParams(location.search).has('perf');
+let perfTimer = null;
+async function pollPerf() {
+    try {
+        const p = await (await fetch('/api/debug/perf')).json();
+        document.getElementById('perf-card').style.display = '';
+        document.getElementById('perf-summary').innerText =
+            `CPU ${p.process.cpu_percent}% | RSS ${p.process.rss_h} | ${p.process.threads} threads`;
+        const stages = Object.entries(p.collectors).concat(
+            ['tick', 'serialize', 'compress', 'openmetrics', 'history', 'alerts'].map(k => [k, p.sampler[k]]));
+        document.querySelector('#perf-table tbody').innerHTML = stages.map(([name, h]) =>
+            `<tr><td>${esc(name)}</td><td>${h.calls}</td><td>${h.p50_ms ?? '--'}</td><td>${h.p95_ms ?? '--'}</td>` +
+            `<td>${h.p99_ms ?? '--'}</td><td>${h.max_ms ?? '--'}</td><td>${h.errors + (h.timeouts || 0)}</td></tr>`
+        ).join('');
+    } catch (e) { console.error("Perf update failed", e); }
+    if (!document.hidden) perfTimer = setTimeout(pollPerf, 5000);
+}
+
+// Only a visible tab keeps the server sampling: hiding the page closes the stream
+// (or stops polling), which lets the sampler fall back to its idle heartbeat.
+let stream = null, pollTimer = null;
+function connect() {
+    pollFleet();
+    if (SHOW_PERF) pollPerf();
+    if (window.EventSource) {
+        stream = new EventSource('/api/stream');
+        stream.addEventListener('full', e => { state = JSON.parse(e.data); render(state); });
+        stream.addEventListener('delta', e => { merge(state, JSON.parse(e.data)); render(state); });
+    } else {
+        pollTimer = setInterval(poll, 2000);
+        poll();
+    }
+}
+function disconnect() {
+    if (stream) { stream.close(); stream = null; }
+    clearInterval(pollTimer);
+    clearTimeout(fleetTimer);
+    clearTimeout(perfTimer);
+}
+document.addEventListener('visibilitychange', () => document.hidden ? disconnect() : connect());
+if (!document.hidden) connect();
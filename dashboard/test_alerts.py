@@ -0,0 +1,33 @@
+from alerts import AlertEngine, Context, NewPortRule
+
+
+def listener(port, pid, name="proc"):
+    return {"proto": "tcp", "addr": "0.0.0.0", "port": port, "pid": pid, "name": name}
+
+
+def test_new_port_ignores_own_listeners():
+    rule = NewPortRule({"name": "new-port"}, pid=100)
+    assert list(rule.evaluate(0, Context({}, [listener(22, 1)]))) == []
+    # The dashboard binds its port after the baseline was taken.
+    assert list(rule.evaluate(1, Context({}, [listener(22, 1), listener(18001, 100)]))) == []
+
+
+def test_new_port_fires_and_resolves():
+    engine = AlertEngine({"rules": [{"name": "new-port", "type": "new_port"}]})
+    engine.evaluate(0, Context({}, [listener(22, 1)]))
+    engine.evaluate(1, Context({}, [listener(22, 1), listener(8080, 2, "nc")]))
+    assert [a["key"] for a in engine.firing()] == ["tcp/8080"]
+    engine.evaluate(2, Context({}, [listener(22, 1)]))
+    assert engine.firing() == []
+    assert [a["state"] for a in engine.history] == ["firing", "resolved"]
+
+
+def test_firing_snapshots_show_value_changes():
+    from linux_utility import diff
+    engine = AlertEngine({"rules": [{"name": "disk-full", "metric": "disk", "above": 80}]})
+    engine.evaluate(0, Context({"disk": 85}))
+    before = {"alerts": engine.firing()}
+    engine.evaluate(1, Context({"disk": 90}))
+    delta = diff(before, {"alerts": engine.firing()})
+    assert delta["alerts"][0]["value"] == 90
+    assert "now 90.0" in delta["alerts"][0]["message"]
@@ -0,0 +1,34 @@
+import os
+import time
+import threading
+
+import filesystems
+from filesystems import FilesystemTable, Mount
+
+
+def test_hung_mounts_do_not_delay_healthy_ones(monkeypatch):
+    release = threading.Event()
+    real_statvfs = os.statvfs
+
+    def statvfs(point):
+        if point.startswith("/hung"):
+            release.wait()  # a dead NFS server
+        return real_statvfs("/")
+
+    monkeypatch.setattr(filesystems.os, "statvfs", statvfs)
+    table = FilesystemTable()
+    table.mounts = {f"/hung{i}": Mount(f"/hung{i}", "srv:/x", "nfs") for i in range(20)}
+    table.mounts["/"] = Mount("/", "/dev/root", "ext4")
+    try:
+        start = time.monotonic()
+        table.update()
+        assert time.monotonic() - start < filesystems.FS_TIMEOUT * 2
+        assert all(m.hung for p, m in table.mounts.items() if p != "/")
+        assert not table.mounts["/"].hung and table.mounts["/"].usage is not None
+        # Later refreshes of the healthy mount are not queued behind the hung calls either.
+        table.mounts["/"].checked = None
+        table.update()
+        assert not table.mounts["/"].hung
+    finally:
+        release.set()
+        table.close()
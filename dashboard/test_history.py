@@ -0,0 +1,24 @@
+from history import HistoryStore
+
+TIERS = ((1, 60), (10, 60))
+
+
+def test_many_nics_do_not_crowd_out_core_series():
+    store = HistoryStore(TIERS)
+    metrics = {"load": 0.5, "cpu": 10, "net.up": 1, "net.down": 2}
+    for i in range(8):  # a docker host's veth interfaces
+        metrics[f"net.veth{i}.up"] = metrics[f"net.veth{i}.down"] = 1
+    metrics.update({"mem": 40, "disk": 70, "proc.python.cpu": 5})
+    store.record(1000, metrics)
+    for name in ("cpu", "mem", "disk", "load", "net.up", "net.down", "proc.python.cpu"):
+        assert store.query(name, 990, 1000), name
+
+
+def test_group_evicts_its_stalest_series():
+    store = HistoryStore(TIERS, {"core": 4, "nic": 4, "proc": 2})
+    store.record(1000, {"proc.a.cpu": 1, "proc.b.cpu": 1})
+    store.record(1001, {"proc.b.cpu": 1, "proc.c.cpu": 1})
+    assert store.query("proc.a.cpu", 990, 1001) is None
+    assert store.query("proc.c.cpu", 990, 1001)
+    store.record(1001, {"proc.d.cpu": 1})  # both seen this tick: refused
+    assert store.query("proc.d.cpu", 990, 1001) is None
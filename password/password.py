@@ -6,6 +6,8 @@ import secrets
 import string
 import shutil
 from pathlib import Path
+
+from vault import HEADER, encode, is_header, new_record
 # --------------------------------
 import colorsys
 
@@ -85,6 +87,18 @@ def encrypt_accounts():
     )
     os.remove(ACCOUNTS_TXT)
 
+def save_entry(site, pwd):
+    # Records come from vault.py like the GUI's; an old flat file is kept flat (the GUI migrates it)
+    with open(ACCOUNTS_TXT, "ab+") as f:
+        f.seek(0)
+        first = f.readline()
+        if first and not is_header(first):
+            f.write((site + "\n" + pwd + "\n\n").encode())
+            return
+        if not first:
+            f.write(HEADER)
+        f.write(encode(new_record(site, pwd)))
+
 def copy_clipboard(text):
     if shutil.which("wl-copy"):
         subprocess.run(
@@ -180,9 +194,7 @@ while True:
 
         site = input(f"{COLORS.WEB}Website (optional): {COLORS.END}").strip()
 
-        with open(ACCOUNTS_TXT, "a") as f:
-            f.write(site + "\n")
-            f.write(pwd + "\n\n")
+        save_entry(site, pwd)
 
         data_written = True
         print(f"{COLORS.ALERT4}[+] Saved{COLORS.END}")
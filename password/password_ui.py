@@ -9,18 +9,24 @@ Run: python3 password_ui.py
 """
 
 import os
+import copy
 import json
+import time
+import asyncio
 import secrets
 import shutil
+import threading
 import subprocess
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi import FastAPI, Request, Form, Header, HTTPException, Query
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 import uvicorn
 
+from vault import HEADER, VaultLog
+
 # ------------------ CONFIG ------------------
 
 APP_NAME = "Secure Pass"
@@ -30,10 +36,16 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 ACCOUNTS_TXT = DATA_DIR / "accounts"
 ACCOUNTS_GPG = DATA_DIR / "accounts.gpg"
 CONFIG_FILE = DATA_DIR / "config.json"
+GNUPG_HOME = Path(os.environ.get("GNUPGHOME") or Path.home() / ".gnupg")
+KEYRING_FILES = ("pubring.kbx", "pubring.gpg", "trustdb.gpg")  # any change here may change the key list
 
 HOST = "127.0.0.1"
 PORT = 8000
 
+FLUSH_DELAY = 2.0       # seconds without saves before the vault is written
+FLUSH_MAX_DELAY = 30.0  # upper bound on how long a change stays unwritten
+PAGE_SIZE = 50          # vault entries per page, in the page itself and /api/entries
+
 # ------------------------------------------------
 
 app = FastAPI()
@@ -41,39 +53,73 @@ templates = Jinja2Templates(directory="templates")
 
 # Simple per-process CSRF token (suffices for localhost tool)
 CSRF_TOKEN = secrets.token_hex(24)
-DATA_WRITTEN = False
+
+# Resolved once per process (a PATH scan); restart the app after installing gpg
+GPG_BIN = shutil.which("gpg")
+
+# In-memory copies, each with the file stamp it was read at
+_config_cache: Optional[Tuple[Optional[Tuple[int, int]], dict]] = None
+_recipients_cache: Optional[Tuple[tuple, List[str]]] = None
 
 
 def has_gpg() -> bool:
-    return shutil.which("gpg") is not None
+    return GPG_BIN is not None
+
+
+def file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    """
+    (mtime_ns, size) of a file, or None if it does not exist: one stat call.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
 
 def load_config() -> dict:
-    if not CONFIG_FILE.exists():
+    """
+    The config, read from disk only when config.json changed since the last read
+    (saves from this process update the cache directly).
+    """
+    global _config_cache
+    stamp = file_stamp(CONFIG_FILE)
+    if stamp is None:
         cfg = {"gpg_enabled": False, "recipients": []}
         save_config(cfg)
-        return cfg
-    try:
-        return json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        return {"gpg_enabled": False, "recipients": []}
+        return copy.deepcopy(cfg)
+    if _config_cache is None or _config_cache[0] != stamp:
+        try:
+            cfg = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            cfg = {"gpg_enabled": False, "recipients": []}
+        _config_cache = (stamp, cfg)
+    return copy.deepcopy(_config_cache[1])
 
 
 def save_config(cfg: dict):
-    CONFIG_FILE.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
+    global _config_cache
+    # temp file + rename: a crash mid-write never leaves a truncated config
+    write_private(CONFIG_FILE, json.dumps(cfg, indent=2).encode("utf-8"))
+    _config_cache = (file_stamp(CONFIG_FILE), copy.deepcopy(cfg))
 
 
 def list_gpg_recipients() -> List[str]:
     """
     Returns list of human-readable uids for keys present in keyring (emails / uid strings).
-    If gpg not available, returns [].
+    If gpg not available, returns []. gpg only runs when a keyring file changed
+    since the last call; otherwise the cached list is returned.
     """
+    global _recipients_cache
     if not has_gpg():
         return []
+    stamp = tuple(file_stamp(GNUPG_HOME / name) for name in KEYRING_FILES)
+    if _recipients_cache is not None and _recipients_cache[0] == stamp:
+        return list(_recipients_cache[1])
     try:
         # Use --with-colons output for easier parsing
         proc = subprocess.run(
-            ["gpg", "--list-keys", "--with-colons"],
+            [GPG_BIN, "--list-keys", "--with-colons"],
             capture_output=True,
             text=True,
             check=True,
@@ -93,7 +139,9 @@ def list_gpg_recipients() -> List[str]:
             if r not in seen:
                 out.append(r)
                 seen.add(r)
-        return out
+        # Stamp taken again afterwards: listing keys may itself rewrite trustdb.gpg
+        _recipients_cache = (tuple(file_stamp(GNUPG_HOME / name) for name in KEYRING_FILES), out)
+        return list(out)
     except Exception:
         return []
 
@@ -108,93 +156,325 @@ def generate_password(length: int) -> str:
     return "".join(secrets.choice(alphabet) for _ in range(max(4, int(length))))
 
 
-def decrypt_if_needed(cfg: dict):
+def gpg_encrypt_cmd(cfg: dict, output: Path) -> List[str]:
     """
-    If a vault exists (accounts.gpg) and config says gpg_enabled and gpg present,
-    attempt to decrypt to accounts file. If decrypt fails, keep the encrypted file and
-    proceed with plaintext mode (do not delete anything).
+    gpg command that encrypts stdin to `output` for the configured recipients
+    (symmetric when gpg is enabled but no recipient is set).
     """
-    try:
-        if cfg.get("gpg_enabled") and ACCOUNTS_GPG.exists() and has_gpg():
-            # Decrypt to ACCOUNTS_TXT, suppress informational stderr to keep UI clean
-            with open(ACCOUNTS_TXT, "w", encoding="utf-8") as out, open(os.devnull, "w") as devnull:
-                subprocess.run(
-                    ["gpg", "--quiet", "--batch", "--yes", "--decrypt", str(ACCOUNTS_GPG)],
-                    stdout=out,
-                    stderr=devnull,
-                    check=True,
-                )
-    except Exception:
-        # On decrypt failure, don't delete anything and continue in plaintext mode.
-        # Leave ACCOUNTS_GPG as-is. ACCOUNTS_TXT may be missing or stale.
-        pass
-    finally:
-        ACCOUNTS_TXT.touch(exist_ok=True)
+    rec_args: List[str] = []
+    for r in cfg.get("recipients", []) or []:
+        rec_args.extend(["-r", r])
+    if not rec_args:
+        return [GPG_BIN, "--quiet", "--batch", "--yes", "--symmetric", "--output", str(output)]
+    return [GPG_BIN, "--quiet", "--batch", "--yes", "--encrypt", *rec_args, "--output", str(output)]
 
 
-def encrypt_if_needed(cfg: dict):
+def write_private(path: Path, data: bytes):
     """
-    If new data was written and GPG is enabled and available, encrypt ACCOUNTS_TXT into ACCOUNTS_GPG.
-    If encryption fails, leave plaintext file in place for manual review.
+    Atomically replace `path` with `data`, readable by the owner only.
     """
-    global DATA_WRITTEN
-    if not DATA_WRITTEN:
-        return
-    if cfg.get("gpg_enabled") and has_gpg():
-        try:
-            # Build recipient args: -r recipient for each
-            rec_args: List[str] = []
-            for r in cfg.get("recipients", []) or []:
-                rec_args.extend(["-r", r])
-            # Fall back to symmetric if no recipients given
-            if not rec_args:
-                # use symmetric encryption if user opted gpg but didn't supply recipients
-                cmd = ["gpg", "--quiet", "--batch", "--yes", "--symmetric", str(ACCOUNTS_TXT)]
-            else:
-                cmd = ["gpg", "--quiet", "--batch", "--yes", "--encrypt", *rec_args, str(ACCOUNTS_TXT)]
-            with open(os.devnull, "w") as devnull:
-                subprocess.run(cmd, stderr=devnull, check=True)
-            # remove plaintext only if encryption succeeded and produced .gpg
-            if ACCOUNTS_GPG.exists():
-                try:
-                    ACCOUNTS_TXT.unlink(missing_ok=True)
-                except Exception:
-                    pass
-        except Exception:
-            # encryption failed; keep plaintext for manual recovery
-            pass
+    tmp = path.with_name(path.name + ".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
 
 
-def read_password_blocks() -> List[str]:
+class Vault:
     """
-    Read the accounts file and return list of blocks separated by blank line.
-    Each block is expected to be two lines:
-      line1 = website/label
-      line2 = password
-    We'll return raw blocks; template will split them.
+    The decrypted vault (a vault.VaultLog), held in memory for the life of the process.
+
+    Saves append one record to the log. Without gpg that record is also
+    appended to the `accounts` file right away. With gpg, writing is
+    write-behind: the background writer waits until saves have been quiet for
+    FLUSH_DELAY (at most FLUSH_MAX_DELAY after the first unsaved change), so
+    any burst of saves costs a single gpg run. The plaintext goes to gpg on
+    stdin and never touches the disk; the ciphertext is written to a temp file
+    and renamed over accounts.gpg.
     """
-    if not ACCOUNTS_TXT.exists():
-        return []
-    try:
-        content = ACCOUNTS_TXT.read_text(encoding="utf-8").strip()
-        if not content:
-            return []
-        blocks = [b for b in content.split("\n\n") if b.strip()]
-        return blocks
-    except Exception:
-        return []
+
+    def __init__(self):
+        self.log = VaultLog()
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()  # one flush at a time: they share accounts.gpg.tmp
+        self.version = 0        # bumped on every change
+        self.flushed = 0        # version last written to disk
+        self.locked = False     # dropped from memory by /lock
+        self.error: Optional[str] = None  # set when the vault on disk could not be read
+        self.pending: Optional[asyncio.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.switching = asyncio.Lock()  # /lock and /unlock, one at a time
+        self.writer: Optional[asyncio.Task] = None
+        self.compacting: Optional[asyncio.Task] = None
+
+    # ---- loading ----
+
+    def load(self, cfg: dict):
+        """
+        Read the vault into memory. A leftover plaintext `accounts` file (from the
+        CLI or an older version of this app) is newer than accounts.gpg, so it wins
+        and gets encrypted and removed on the next flush. Vaults in the old flat
+        format are converted while they are read and rewritten on the next flush.
+        """
+        log = VaultLog()
+        self.error = None
+        try:
+            if ACCOUNTS_TXT.exists() and ACCOUNTS_TXT.stat().st_size:
+                with open(ACCOUNTS_TXT, "rb") as f:
+                    log = VaultLog.load(f)
+            elif ACCOUNTS_GPG.exists():
+                if not has_gpg():
+                    raise RuntimeError("accounts.gpg exists but gpg is not installed")
+                # Parse gpg's output as it streams in; the plaintext only ever exists in memory
+                proc = subprocess.Popen(
+                    [GPG_BIN, "--quiet", "--batch", "--decrypt", str(ACCOUNTS_GPG)],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+                with proc:
+                    log = VaultLog.load(proc.stdout)
+                if proc.returncode:
+                    raise RuntimeError(f"gpg exited with status {proc.returncode}")
+        except Exception as e:
+            # Keep the vault on disk untouched; saves are refused until it can be read.
+            log = VaultLog()
+            self.error = f"Could not open the vault: {e}"
+        log.build_index()  # search index, kept up to date by every save from here on
+        with self.lock:
+            self.log = log
+            self.locked = False
+            self.version += 1
+            # Plaintext at rest with gpg on, or the old format, still needs a full flush.
+            rewrite = log.migrated or (cfg.get("gpg_enabled") and has_gpg() and ACCOUNTS_TXT.exists())
+            self.flushed = self.version - 1 if rewrite else self.version
+        if rewrite:
+            self.schedule()
+
+    # ---- changes ----
+
+    def check_writable(self):
+        """
+        Called with the lock held, so a save cannot slip in after /lock has started.
+        """
+        if self.error:
+            raise RuntimeError(self.error)
+        if self.locked:
+            raise RuntimeError("Vault is locked")
+
+    def add(self, cfg: dict, website: str, password: str, username: str = "") -> dict:
+        with self.lock:
+            self.check_writable()
+            rec, line = self.log.put(website, password, username)
+            self.changed(cfg, line)
+        return rec
+
+    def delete(self, cfg: dict, rid: str) -> bool:
+        with self.lock:
+            self.check_writable()
+            line = self.log.delete(rid)
+            if line is None:
+                return False
+            self.changed(cfg, line)
+        return True
+
+    def changed(self, cfg: dict, line: bytes):
+        """
+        Called with the lock held after `line` was appended to the log.
+        """
+        self.version += 1
+        if not (cfg.get("gpg_enabled") and has_gpg()) and self.flushed == self.version - 1 and ACCOUNTS_TXT.exists():
+            # Plaintext vault already up to date on disk: O(1) append instead of a rewrite.
+            # Only onto a file in the record format; an empty (touched) or flat file is
+            # left dirty, so the writer rewrites it whole, header first.
+            try:
+                with open(ACCOUNTS_TXT, "ab+") as f:
+                    f.seek(0)
+                    if f.read(len(HEADER)) == HEADER:
+                        f.write(line)
+                        self.flushed = self.version
+            except OSError:
+                pass  # left dirty; the writer rewrites the whole file
+        if self.flushed != self.version:
+            self.schedule()
+        if self.log.needs_compaction() and self.compacting is None:
+            self.compacting = asyncio.get_running_loop().create_task(self.compact())
+
+    def touch(self):
+        """
+        Mark the vault changed without new entries (e.g. new recipients), so it is rewritten.
+        """
+        if self.error or self.locked:
+            return
+        with self.lock:
+            self.version += 1
+        self.schedule()
+
+    def page(self, query: str = "", cursor: str = "", limit: int = PAGE_SIZE) -> dict:
+        """
+        One page of entries: all of them in save order, or those whose site
+        matches `query` (see VaultLog.match_sites), best match first. The cursor
+        is the id of the previous page's last entry, so saves and deletes made
+        between pages neither skip nor repeat entries.
+        """
+        with self.lock:
+            try:
+                if query.strip():
+                    ids = self.log.search(query)
+                    total = len(ids)
+                    start = ids.index(cursor) + 1 if cursor else 0
+                    ids = ids[start:start + limit + 1]
+                else:
+                    total = len(self.log)
+                    ids = self.log.ids(cursor, limit + 1)
+            except (KeyError, ValueError):
+                raise ValueError("Unknown cursor; reload the list")
+            entries = [self.log.get(rid) for rid in ids[:limit]]
+        more = len(ids) > limit
+        return {"entries": entries, "total": total, "next_cursor": entries[-1]["id"] if more else None}
+
+    async def compact(self):
+        """
+        Drop superseded records and tombstones. The copy is built off the lock in a
+        thread; saves made meanwhile are replayed onto it before it is swapped in.
+        """
+        try:
+            with self.lock:
+                start = len(self.log.data)
+                snapshot = self.log.snapshot()
+            compacted = await asyncio.to_thread(self.build, *snapshot)
+            with self.lock:
+                compacted.catch_up(self.log, start)
+                self.log = compacted
+                self.version += 1
+            self.schedule()
+        finally:
+            self.compacting = None
+
+    @staticmethod
+    def build(data: bytes, offsets: List[int]) -> VaultLog:
+        log = VaultLog.compacted(data, offsets)
+        log.build_index()
+        return log
+
+    # ---- write-behind ----
+
+    def flush(self, cfg: dict, final: bool = False, locking: bool = False) -> bool:
+        """
+        Write unsaved changes: encrypted when gpg is enabled and available, otherwise
+        as the plaintext `accounts` file. On a failed final flush (shutdown) the
+        plaintext is written anyway so nothing saved in this session is lost.
+        A locked vault is not in memory and is never written, except by the
+        flush lock_now() makes before it drops the log (`locking`).
+        """
+        with self.flushing:
+            return self.write(cfg, final, locking)
+
+    def write(self, cfg: dict, final: bool, locking: bool) -> bool:
+        with self.lock:
+            version = self.version
+            if version == self.flushed or self.error or (self.locked and not locking):
+                return True
+            data = bytes(self.log.data)
+        try:
+            if cfg.get("gpg_enabled") and has_gpg():
+                tmp = ACCOUNTS_GPG.with_name(ACCOUNTS_GPG.name + ".tmp")
+                with open(os.devnull, "w") as devnull:
+                    subprocess.run(gpg_encrypt_cmd(cfg, tmp), input=data, stdout=devnull, stderr=devnull, check=True)
+                os.replace(tmp, ACCOUNTS_GPG)
+                ACCOUNTS_TXT.unlink(missing_ok=True)
+            else:
+                write_private(ACCOUNTS_TXT, data)
+        except Exception:
+            if not final:
+                return False  # stays dirty; retried on the next save, lock or shutdown
+            # encryption failed at exit; keep plaintext for manual recovery
+            write_private(ACCOUNTS_TXT, data)
+        with self.lock:
+            self.flushed = max(self.flushed, version)
+        return True
+
+    def schedule(self):
+        # Also called from worker threads (load() under /unlock); Event.set() is not thread-safe
+        if self.pending is not None:
+            self.loop.call_soon_threadsafe(self.pending.set)
+
+    async def run_writer(self):
+        self.loop = asyncio.get_running_loop()
+        self.pending = asyncio.Event()
+        if self.flushed != self.version:
+            self.pending.set()  # changed during load (migration, leftover plaintext)
+        while True:
+            await self.pending.wait()
+            first = time.monotonic()
+            while time.monotonic() - first < FLUSH_MAX_DELAY:
+                self.pending.clear()
+                try:
+                    await asyncio.wait_for(self.pending.wait(), FLUSH_DELAY)
+                except asyncio.TimeoutError:
+                    break  # quiet for FLUSH_DELAY: the burst is over
+            self.pending.clear()
+            await asyncio.to_thread(self.flush, load_config())
+
+    def start(self):
+        self.writer = asyncio.create_task(self.run_writer())
+
+    async def stop(self):
+        if self.writer:
+            self.writer.cancel()
+        if self.compacting:
+            await self.compacting
+        await asyncio.to_thread(self.flush, load_config(), True)
+
+    async def lock_now(self, cfg: dict) -> bool:
+        """
+        Flush immediately and, if the vault is encrypted at rest, drop it from memory.
+        Saves are refused from the start, and the log is only dropped if the
+        flush wrote everything, so a save racing the lock cannot be lost.
+        """
+        if not (cfg.get("gpg_enabled") and has_gpg()):
+            return await asyncio.to_thread(self.flush, cfg)
+        async with self.switching:
+            with self.lock:
+                if self.locked:
+                    return True
+                self.locked = True
+            if self.compacting:
+                await self.compacting  # its swap bumps the version
+            ok = await asyncio.to_thread(self.flush, cfg, False, True)
+            with self.lock:
+                if not ok or self.flushed != self.version:
+                    self.locked = False
+                    return False
+                if ACCOUNTS_GPG.exists():
+                    self.log = VaultLog()
+                else:
+                    self.locked = False  # nothing encrypted at rest to unlock from
+            return True
+
+    async def unlock(self, cfg: dict):
+        """
+        Reload a vault that is not in memory; reloading a loaded one would drop unwritten saves.
+        """
+        async with self.switching:
+            if self.locked or self.error:
+                await asyncio.to_thread(self.load, cfg)
+
+
+VAULT = Vault()
 
 
 # ------------------ FastAPI routes ------------------
 
 
 @app.on_event("startup")
-def startup_event():
-    # ensure data dir and base files exist
+async def startup_event():
+    # ensure data dir exists and load the vault once; it stays in memory from here on
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     cfg = load_config()
-    decrypt_if_needed(cfg)
-    ACCOUNTS_TXT.touch(exist_ok=True)
+    await asyncio.to_thread(VAULT.load, cfg)
+    VAULT.start()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -202,21 +482,43 @@ def index(request: Request):
     cfg = load_config()
     gpg_available = has_gpg()
     gpg_keys = list_gpg_recipients() if gpg_available else []
-    pw_blocks = read_password_blocks()
+    page = VAULT.page()
     return templates.TemplateResponse(
+        request,
         "index.html",
         {
-            "request": request,
             "app_name": APP_NAME,
             "csrf_token": CSRF_TOKEN,
             "config": cfg,
             "gpg_available": gpg_available,
             "gpg_keys": gpg_keys,
-            "passwords": pw_blocks,
+            "page": page,
+            "page_size": PAGE_SIZE,
+            "vault_locked": VAULT.locked,
+            "vault_error": VAULT.error,
         },
     )
 
 
+@app.get("/api/entries")
+def entries(
+    q: str = "",
+    cursor: str = "",
+    limit: int = Query(PAGE_SIZE, ge=1, le=500),
+    x_csrf_token: str = Header(""),
+):
+    """
+    Cursor-paginated entries, optionally filtered by a fuzzy, case-insensitive site search.
+    """
+    # The response holds passwords, so it needs the page's token like the forms do
+    if x_csrf_token != CSRF_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid CSRF token")
+    try:
+        return VAULT.page(q, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/generate")
 async def generate(length: int = Form(...), csrf_token: str = Form(...)):
     # CSRF
@@ -230,28 +532,41 @@ async def generate(length: int = Form(...), csrf_token: str = Form(...)):
 
 
 @app.post("/save")
-async def save(website: Optional[str] = Form(""), password: str = Form(...), csrf_token: str = Form(...)):
-    global DATA_WRITTEN
+async def save(
+    website: Optional[str] = Form(""),
+    username: Optional[str] = Form(""),
+    password: str = Form(...),
+    csrf_token: str = Form(...),
+):
     if csrf_token != CSRF_TOKEN:
         raise HTTPException(status_code=403, detail="Invalid CSRF token")
     # sanitize newlines in website and password
     website_clean = (website or "").strip().splitlines()[0] if website else ""
     password_clean = (password or "").strip().splitlines()[0]
-    # append block
+    username_clean = (username or "").strip()
+    # one record appended to the in-memory log; with gpg the writer encrypts the batch once saves go quiet
     try:
-        with open(ACCOUNTS_TXT, "a", encoding="utf-8") as f:
-            f.write(website_clean + "\n")
-            f.write(password_clean + "\n\n")
-        DATA_WRITTEN = True
-        cfg = load_config()
-        encrypt_if_needed(cfg)
-        decrypt_if_needed(cfg)
-    except Exception:
-        raise HTTPException(status_code=500, detail="Failed to write vault file")
+        VAULT.add(load_config(), website_clean, password_clean, username_clean)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     # redirect back to index (Post-Redirect-Get)
     return RedirectResponse("/", status_code=303)
 
 
+@app.post("/delete")
+async def delete(entry_id: str = Form(...), csrf_token: str = Form(...)):
+    if csrf_token != CSRF_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid CSRF token")
+    # appends a tombstone; the record itself goes away at the next compaction
+    try:
+        found = VAULT.delete(load_config(), entry_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail="No such entry")
+    return RedirectResponse("/", status_code=303)
+
+
 @app.post("/config")
 async def update_config(request: Request):
     """
@@ -276,19 +591,37 @@ async def update_config(request: Request):
     # Deduplicate/trim
     recipients = [r.strip() for r in recipients if r and r.strip()]
     cfg = {"gpg_enabled": bool(gpg_enabled), "recipients": recipients}
+    changed = cfg != load_config()
     save_config(cfg)
-    # After changing config, if gpg_enabled is True and accounts.gpg exists and gpg available, try decrypt now
-    try:
-        decrypt_if_needed(cfg)
-    except Exception:
-        pass
+    # Encryption on/off or new recipients: rewrite the vault in its new form
+    if changed:
+        VAULT.touch()
+    return RedirectResponse("/", status_code=303)
+
+
+@app.post("/lock")
+async def lock(csrf_token: str = Form(...)):
+    """
+    Write pending changes now and forget the decrypted vault until /unlock.
+    """
+    if csrf_token != CSRF_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid CSRF token")
+    if not await VAULT.lock_now(load_config()):
+        raise HTTPException(status_code=500, detail="Failed to write vault file")
+    return RedirectResponse("/", status_code=303)
+
+
+@app.post("/unlock")
+async def unlock(csrf_token: str = Form(...)):
+    if csrf_token != CSRF_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid CSRF token")
+    await VAULT.unlock(load_config())
     return RedirectResponse("/", status_code=303)
 
 
 @app.on_event("shutdown")
-def shutdown_event():
-    cfg = load_config()
-    encrypt_if_needed(cfg)
+async def shutdown_event():
+    await VAULT.stop()
 
 
 # ------------------ entry ------------------
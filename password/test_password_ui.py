@@ -0,0 +1,21 @@
+import password_ui
+from vault import HEADER, VaultLog
+
+
+def test_first_save_to_an_empty_plaintext_vault_writes_the_header(tmp_path, monkeypatch):
+    accounts = tmp_path / "accounts"
+    accounts.touch()  # what the CLI and older versions of the app leave behind
+    monkeypatch.setattr(password_ui, "ACCOUNTS_TXT", accounts)
+    monkeypatch.setattr(password_ui, "ACCOUNTS_GPG", tmp_path / "accounts.gpg")
+    cfg = {"gpg_enabled": False, "recipients": []}
+    vault = password_ui.Vault()
+    vault.load(cfg)
+    vault.add(cfg, "github.com", "secret", "me")
+    assert vault.flushed != vault.version  # not appended to the headerless file
+    assert vault.flush(cfg)
+    assert accounts.read_bytes().startswith(HEADER)
+    vault.add(cfg, "gitlab.com", "other")  # now appended in place
+    assert vault.flushed == vault.version
+    with open(accounts, "rb") as f:
+        log = VaultLog.load(f)
+    assert [(r["site"], r["password"]) for r in log.records()] == [("github.com", "secret"), ("gitlab.com", "other")]
@@ -0,0 +1,42 @@
+from vault import VaultLog
+
+
+def vault(*sites):
+    log = VaultLog()
+    for site in sites:
+        log.put(site, "pw")
+    return log
+
+
+def test_match_sites_finds_mid_word_substrings():
+    log = vault("github.com", "gitlab.com")
+    assert log.match_sites("ithu") == ["github.com"]
+
+
+def test_match_sites_ranks_prefix_then_substring_then_fuzzy():
+    log = vault("mygithub.org", "github.com", "githbu.io", "example.com")
+    assert log.match_sites("github") == ["github.com", "mygithub.org", "githbu.io"]
+
+
+def test_match_sites_tolerates_typos():
+    log = vault("google.com", "example.com")
+    assert log.match_sites("gogle") == ["google.com"]
+
+
+def test_match_sites_needs_every_word():
+    log = vault("x.com", "xbox.com", "y.com", "ab.com", "cd.com")
+    assert log.match_sites("x.com") == ["x.com", "xbox.com"]
+
+
+def test_match_sites_short_query_is_a_substring_scan():
+    log = vault("github.com", "gitlab.com", "example.com")
+    assert log.match_sites("IT") == ["github.com", "gitlab.com"]
+
+
+def test_ids_after_survives_saves_and_deletes():
+    log = vault("a", "b", "c", "d")
+    first = log.ids(limit=2)
+    log.delete(first[0])
+    log.delete(first[1])  # the cursor itself
+    log.put("e", "pw")
+    assert [log.get(rid)["site"] for rid in log.ids(first[1])] == ["c", "d", "e"]
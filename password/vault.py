@@ -0,0 +1,353 @@
+"""
+vault.py
+Structured vault format: an append-only log of JSON records with an in-memory offset index.
+
+The first line is a header ({"format": "pingsvault", "version": 1}); every
+following line is either a record
+
+    {"id": ..., "site": ..., "username": ..., "password": ..., "created": ..., "updated": ...}
+
+or a tombstone {"id": ..., "deleted": <time>}. Saving a new version of an
+entry appends a record with the same id; the newest line for an id wins.
+Only the byte offset of each live record is indexed, and records are parsed
+when they are read, so loading is one pass over the lines and lookups by id
+or site are dict hits. Superseded lines are dropped by compaction, which
+copies the live records into a new log.
+
+Older vaults ("site\\npassword\\n\\n" blocks) are converted line by line on load.
+"""
+
+import re
+import json
+import math
+import time
+import secrets
+from itertools import dropwhile, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+FORMAT = "pingsvault"
+VERSION = 1
+HEADER = json.dumps({"format": FORMAT, "version": VERSION}).encode() + b"\n"
+
+COMPACT_MIN_DEAD = 1000  # superseded lines before compaction is considered
+COMPACT_RATIO = 0.5      # ...and they must be at least this share of all lines
+MATCH_MIN = 0.5          # share of the query's trigrams a site must contain to match
+
+
+def new_id() -> str:
+    return secrets.token_hex(8)
+
+
+def site_key(site: str) -> str:
+    """
+    Lookup key for a site: case-insensitive, ignoring surrounding whitespace.
+    """
+    return site.strip().lower()
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Trigrams of each word (split on anything not a letter or digit), padded
+    like pg_trgm so word starts weigh more: "git" -> "  g", " gi", "git", "it ".
+    """
+    grams = set()
+    for word in re.split(r"[\W_]+", text):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def new_record(site: str, password: str, username: str = "", rid: Optional[str] = None,
+               created: Optional[float] = None) -> dict:
+    """
+    A record for a new entry, or a new version of entry `rid` first saved at `created`.
+    """
+    now = time.time()
+    return {"id": rid or new_id(), "site": site, "username": username, "password": password,
+            "created": now if created is None else created, "updated": now}
+
+
+def encode(rec: dict) -> bytes:
+    """
+    The log line for a record or tombstone.
+    """
+    return json.dumps(rec, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def is_header(line: bytes) -> bool:
+    try:
+        head = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(head, dict) and head.get("format") == FORMAT
+
+
+def migrate_flat(lines: Iterable[bytes], now: Optional[float] = None) -> Iterator[dict]:
+    """
+    Convert an old vault to records as it is read. Entries were written as
+    exactly three lines: site (possibly empty), password, blank.
+    """
+    now = time.time() if now is None else now
+    block: List[str] = []
+    for raw in lines:
+        line = raw.decode("utf-8").rstrip("\n")
+        if len(block) == 2:
+            yield from _flat_record(block, now)
+            block = []
+            if not line:
+                continue  # the separator
+        block.append(line)
+    yield from _flat_record(block, now)
+
+
+def _flat_record(block: List[str], now: float) -> Iterator[dict]:
+    if any(block):
+        yield {"id": new_id(), "site": block[0], "username": "",
+               "password": block[1] if len(block) > 1 else "", "created": now, "updated": now}
+
+
+def parse_lines(lines: List[bytes]) -> List[Tuple[bytes, dict]]:
+    """
+    (line, record) pairs. The whole log is parsed as one JSON array, which is
+    several times faster than a json.loads per line; a torn line (crash while
+    appending) makes it fall back to line by line, skipping what does not parse.
+    """
+    lines = [l for l in lines if l.strip()]
+    try:
+        return list(zip(lines, json.loads(b"[" + b",".join(lines) + b"]")))
+    except ValueError:
+        pass
+    out = []
+    for line in lines:
+        try:
+            out.append((line, json.loads(line)))
+        except ValueError:
+            continue
+    return out
+
+
+class VaultLog:
+    """
+    The log bytes plus two indexes: id -> offset of its newest record, and
+    site key -> ids. Not thread-safe; the caller holds a lock.
+    """
+
+    def __init__(self):
+        self.data = bytearray(HEADER)
+        self.offsets: Dict[str, int] = {}     # id -> offset of the live record, in creation order
+        self.sites: Dict[str, List[str]] = {}  # site_key -> ids
+        self.order: Dict[str, int] = {}       # id -> rank of its first save; deleted ids keep theirs (page cursors)
+        self.grams: Optional[Dict[str, Set[str]]] = None  # trigram -> site keys, built on first search
+        self.lines = 0                         # record and tombstone lines after the header
+        self.migrated = False                  # loaded from the old flat format
+
+    # ---- loading ----
+
+    @classmethod
+    def load(cls, lines: Iterable[bytes]) -> "VaultLog":
+        """
+        Build a log from the lines of a vault file, in either format, in one pass.
+        """
+        log = cls()
+        lines = iter(lines)
+        first = next(lines, b"")
+        if not first:
+            return log
+        if is_header(first):
+            for line, rec in parse_lines(b"".join(lines).split(b"\n")):
+                offset = len(log.data)
+                log.data += line + b"\n"
+                log.lines += 1
+                log.index(rec, offset)
+            return log
+        for rec in migrate_flat(_chain(first, lines)):
+            log.append(rec)
+        log.migrated = True
+        return log
+
+    def replay(self, rec: dict, line: bytes):
+        offset = len(self.data)
+        self.data += line
+        self.lines += 1
+        self.index(rec, offset)
+
+    # ---- index ----
+
+    def index(self, rec: dict, offset: int):
+        rid = rec["id"]
+        if rid not in self.order:
+            self.order[rid] = len(self.order)
+        if rid in self.offsets:
+            self.unlink_site(self.read_at(self.offsets[rid])["site"], rid)
+        if "deleted" in rec:
+            self.offsets.pop(rid, None)
+            return
+        self.offsets[rid] = offset
+        key = site_key(rec["site"])
+        if key not in self.sites:
+            self.sites[key] = []
+            if self.grams is not None:
+                for gram in trigrams(key):
+                    self.grams.setdefault(gram, set()).add(key)
+        self.sites[key].append(rid)
+
+    def unlink_site(self, site: str, rid: str):
+        key = site_key(site)
+        ids = self.sites.get(key)
+        if ids and rid in ids:
+            ids.remove(rid)
+            if not ids:
+                del self.sites[key]
+                if self.grams is not None:
+                    for gram in trigrams(key):
+                        keys = self.grams.get(gram)
+                        if keys is not None:
+                            keys.discard(key)
+                            if not keys:
+                                del self.grams[gram]
+
+    # ---- reads ----
+
+    def read_at(self, offset: int) -> dict:
+        end = self.data.index(b"\n", offset)
+        return json.loads(self.data[offset:end])
+
+    def get(self, rid: str) -> Optional[dict]:
+        offset = self.offsets.get(rid)
+        return None if offset is None else self.read_at(offset)
+
+    def find(self, site: str) -> List[dict]:
+        """
+        Live records for a site (case-insensitive exact match).
+        """
+        return [self.read_at(self.offsets[rid]) for rid in self.sites.get(site_key(site), ())]
+
+    def build_index(self):
+        """
+        Build the trigram index; from then on index() and unlink_site() keep it current.
+        """
+        if self.grams is None:
+            self.grams = {}
+            for key in self.sites:
+                for gram in trigrams(key):
+                    self.grams.setdefault(gram, set()).add(key)
+
+    def match_sites(self, query: str) -> List[str]:
+        """
+        Site keys matching a query, best first: prefix matches, then substring
+        matches, then fuzzy ones sharing at least MATCH_MIN of the query's
+        trigrams and at least one trigram of every word in it.
+        """
+        q = site_key(query)
+        # Substrings come from a scan over the distinct sites: trigrams miss mid-word ones ("ithu").
+        hits = {key: 1.0 for key in self.sites if q in key}
+        words = [trigrams(word) for word in re.split(r"[\W_]+", q) if word]
+        if len(q) >= 3 and words:
+            self.build_index()
+            wanted = set().union(*words)
+            need = max(1, math.ceil(MATCH_MIN * len(wanted)))
+            # A site sharing `need` trigrams shares at least one of any len - need + 1 of
+            # them, so only the postings of the rarest ones are read.
+            rarest = sorted(wanted, key=lambda gram: len(self.grams.get(gram, ())))[:len(wanted) - need + 1]
+            candidates = set()
+            for gram in rarest:
+                candidates.update(self.grams.get(gram, ()))
+            for key in candidates - hits.keys():
+                grams = trigrams(key)
+                n = len(wanted & grams)
+                # Every word must match: "x.com" is not close to every short .com site.
+                if n >= need and all(word & grams for word in words):
+                    hits[key] = n / len(wanted)
+        ranked = sorted(hits.items(), key=lambda hit: (not hit[0].startswith(q), q not in hit[0], -hit[1], len(hit[0]), hit[0]))
+        return [key for key, _ in ranked]
+
+    def search(self, query: str) -> List[str]:
+        """
+        Ids of the live records whose site matches `query`, best match first.
+        """
+        return [rid for key in self.match_sites(query) for rid in self.sites[key]]
+
+    def ids(self, after: str = "", limit: Optional[int] = None) -> List[str]:
+        """
+        Up to `limit` live ids in the order they were first saved, starting after
+        id `after` (which may have been deleted since). KeyError for an unknown id.
+        """
+        ids = iter(self.offsets)
+        if after:
+            rank = self.order[after]
+            ids = dropwhile(lambda rid: self.order[rid] <= rank, ids)
+        return list(islice(ids, limit))
+
+    def records(self) -> Iterator[dict]:
+        """
+        Live records in the order they were first saved.
+        """
+        for offset in list(self.offsets.values()):
+            yield self.read_at(offset)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    # ---- writes ----
+
+    def append(self, rec: dict) -> bytes:
+        """
+        Append a record or tombstone and index it; returns the line written.
+        """
+        line = encode(rec)
+        self.replay(rec, line)
+        return line
+
+    def put(self, site: str, password: str, username: str = "", rid: Optional[str] = None) -> Tuple[dict, bytes]:
+        """
+        Save a new entry, or a new version of entry `rid`.
+        """
+        old = self.get(rid) if rid else None
+        rec = new_record(site, password, username, rid, old["created"] if old else None)
+        return rec, self.append(rec)
+
+    def delete(self, rid: str) -> Optional[bytes]:
+        if rid not in self.offsets:
+            return None
+        return self.append({"id": rid, "deleted": time.time()})
+
+    # ---- compaction ----
+
+    def dead(self) -> int:
+        return self.lines - len(self.offsets)
+
+    def needs_compaction(self) -> bool:
+        dead = self.dead()
+        return dead >= COMPACT_MIN_DEAD and dead >= COMPACT_RATIO * self.lines
+
+    def snapshot(self) -> Tuple[bytes, List[int]]:
+        """
+        Copy of the log and its live offsets, to compact without holding the caller's lock.
+        """
+        return bytes(self.data), list(self.offsets.values())
+
+    @classmethod
+    def compacted(cls, data: bytes, offsets: List[int]) -> "VaultLog":
+        """
+        A new log holding only the live records of a snapshot, in the same order.
+        """
+        log = cls()
+        live = []
+        for offset in offsets:
+            live.append(data[offset:data.index(b"\n", offset)])
+        for line, rec in parse_lines(live):
+            log.replay(rec, line + b"\n")
+        return log
+
+    def catch_up(self, source: "VaultLog", start: int):
+        """
+        Replay the lines `source` gained after byte `start` (appends made while compacting).
+        """
+        for line, rec in parse_lines(bytes(source.data[start:]).split(b"\n")):
+            self.replay(rec, line + b"\n")
+
+
+def _chain(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield from rest